@@ -0,0 +1,53 @@
+#!/usr/bin/python
+#
+# render many plots and images to PNG files without a wx.App,
+# comparing rendering one at a time with render_many()
+
+import os
+import time
+import numpy as np
+from wxmplot import render_plot, render_image, render_many
+
+NPLOTS = 48
+outdir = 'batch_output'
+
+def main():
+    os.makedirs(outdir, exist_ok=True)
+
+    x = np.linspace(0, 20, 2001)
+    jobs = []
+    for i in range(NPLOTS):
+        y1 = np.sin((1 + 0.1*i)*x)*np.exp(-x/(5+i))
+        y2 = np.cos((1 + 0.1*i)*x)*np.exp(-x/(5+i))
+        jobs.append({'traces': [(x, y1), {'xdata': x, 'ydata': y2,
+                                           'label': 'cos', 'style': 'dashed'}],
+                     'title': 'plot %d' % i, 'xlabel': 'x', 'ylabel': 'y',
+                     'filename': os.path.join(outdir, 'plot_%3.3d.png' % i)})
+
+    ix, iy = np.meshgrid(np.linspace(-3, 3, 1024), np.linspace(-3, 3, 1024))
+    for i in range(NPLOTS//4):
+        data = np.exp(-(ix-0.1*i)**2 - iy**2) + 0.05*np.random.random(ix.shape)
+        jobs.append({'kind': 'image', 'data': data,
+                     'config': {'colormap': 'viridis', 'contrast_level': 0.5},
+                     'filename': os.path.join(outdir, 'image_%3.3d.png' % i)})
+
+    t0 = time.time()
+    for job in jobs:
+        job = dict(job)
+        if job.pop('kind', 'plot') == 'image':
+            render_image(**job)
+        else:
+            render_plot(**job)
+    dt_serial = time.time() - t0
+
+    t0 = time.time()
+    render_many(jobs)
+    dt_pool = time.time() - t0
+
+    print("rendered %d plots and images with %d CPUs" % (len(jobs), os.cpu_count()))
+    print("  one at a time: %.2f sec (%.1f per sec)" % (dt_serial, len(jobs)/dt_serial))
+    print("  render_many:   %.2f sec (%.1f per sec)" % (dt_pool, len(jobs)/dt_pool))
+
+# worker processes may re-import this script, as on Windows and macOS
+if __name__ == '__main__':
+    main()
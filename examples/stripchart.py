@@ -102,12 +102,6 @@ class StripChartFrame(wx.Frame):
 
     def onStartTimer(self,event=None):
         self.count    = 0
-        t0, y0, y1 = next_data()
-        self.y2list = [y0]
-        self.y1list = [y0]
-        self.y2list = [y1]
-        self.tlist = [t0]
-        self.tmin_last = -10000
         self.time0    = time.time()
         self.timer.Start(50)
 
@@ -116,31 +110,22 @@ class StripChartFrame(wx.Frame):
 
     def onTimer(self, event):
         self.count += 1
-        now = time.time()
-        tmin = now - float(self.time_range.GetValue())
         t1, y1, y2 = next_data()
-        self.tlist.append(t1)
-        self.y1list.append(y1)
-        self.y2list.append(y2)
-        t0 = self.tlist[0]
-        tdat = np.array(self.tlist)
-        mask = np.where(tdat > tmin)
-
-        y1dat = np.array(self.y1list)[mask]
-        y2dat = np.array(self.y2list)[mask]
-        tdat = np.array(self.tlist)[mask]
-        tdat /= 86400.  # convert timestamps to matplotlib date, need TimeZone!!
-        n = len(self.y1list)
-
-        if n <= 2:
-            self.plotpanel.plot(tdat, y1dat, use_date=True, timezone=TZONE,
+        t1 /= 86400.  # convert timestamps to matplotlib date, need TimeZone!!
+        twindow = float(self.time_range.GetValue())/86400.
+
+        if self.count <= 1:
+            self.plotpanel.plot([t1], [y1], use_dates=True, timezone=TZONE,
                                 xlabel='time', ylabel='Val 1', yaxes_tracecolor=True)
-            self.plotpanel.oplot(tdat, y2dat, yaxes=2, y2label='Value 2',
+            self.plotpanel.oplot([t1], [y2], yaxes=2, y2label='Value 2',
                                  use_dates=True, timezone=TZONE)
         else:
-            self.plotpanel.update_line(0, tdat, y1dat, draw=True)
-            self.plotpanel.update_line(1, tdat, y2dat, draw=True, yaxes=2)
-            # self.write_message(f"update {n} points in {(now-self.time0):.2f} sec")
+            # keep up to 1 hour of data at 20 Hz, show only the time range
+            self.plotpanel.append_data(0, t1, y1, maxlen=72000,
+                                       xwindow=twindow, draw=False)
+            self.plotpanel.append_data(1, t1, y2, maxlen=72000,
+                                       xwindow=twindow, draw=True)
+            # self.write_message(f"update {self.count} points in {(time.time()-self.time0):.2f} sec")
 
     def OnAbout(self, event):
         dlg = wx.MessageDialog(self, "wxmplot example: stripchart app",
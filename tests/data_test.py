@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+# tests of data handling that needs only numpy (but importing wxmplot needs wx)
+
+import numpy as np
+import pytest
+
+pytest.importorskip('wx')
+
+from matplotlib.path import Path
+
+from wxmplot.decimate import minmax_decimate
+from wxmplot.ringbuffer import RingBuffer
+from wxmplot.config import data_stats
+from wxmplot.spatialindex import SortedIndex, GridIndex
+from wxmplot.arraycache import ArrayCache
+from wxmplot.tiledimage import TiledImage
+from wxmplot.utils import polygon_mask
+
+
+def check_columns(x, y, xd, yd, npix):
+    "decimated data should have the min and max y of each pixel column"
+    edges = np.linspace(x[0], x[-1], npix+1)
+    col = np.searchsorted(edges[:-1], x, side='right') - 1
+    dcol = np.searchsorted(edges[:-1], xd, side='right') - 1
+    for icol in np.unique(col):
+        assert y[col == icol].min() == yd[dcol == icol].min()
+        assert y[col == icol].max() == yd[dcol == icol].max()
+
+def test_minmax_decimate():
+    rng = np.random.default_rng(1)
+    x = np.linspace(0, 10, 100000)
+    y = np.cumsum(rng.normal(size=len(x)))
+    xd, yd = minmax_decimate(x, y, 200)
+    assert len(xd) <= 4*200
+    assert xd[0] == x[0] and xd[-1] == x[-1]
+    assert yd[0] == y[0] and yd[-1] == y[-1]
+    assert np.all(np.isin(xd, x))
+    check_columns(x, y, xd, yd, 200)
+
+    # decreasing x gives the same points
+    xr, yr = minmax_decimate(x[::-1], y[::-1], 200)
+    assert np.array_equal(xr, xd) and np.array_equal(yr, yd)
+
+    # a visible range keeps one point on either side of it
+    xd, yd = minmax_decimate(x, y, 100, xmin=2.0, xmax=3.0)
+    inside = (x >= 2.0) & (x <= 3.0)
+    i0, i1 = np.flatnonzero(inside)[[0, -1]]
+    assert xd[0] == x[i0-1] and xd[-1] == x[i1+1]
+    check_columns(x[i0-1:i1+2], y[i0-1:i1+2], xd, yd, 100)
+
+    # small data is unchanged
+    xd, yd = minmax_decimate(x[:300], y[:300], 200)
+    assert np.array_equal(xd, x[:300])
+    assert np.array_equal(yd, y[:300])
+
+def test_ringbuffer():
+    rng = np.random.default_rng(2)
+    buff = RingBuffer(maxlen=100)
+    xall, yall = np.zeros(0), np.zeros(0)
+    for npts in (30, 50, 40, 1, 99, 7, 250, 3):
+        xnew = xall[-1] + 1 + np.arange(npts) if len(xall) else np.arange(npts)*1.0
+        ynew = rng.normal(size=npts)
+        buff.append(xnew, ynew)
+        xall, yall = np.append(xall, xnew), np.append(yall, ynew)
+        assert len(buff) == min(100, len(xall))
+        assert np.array_equal(buff.xdata, xall[-100:])
+        assert np.array_equal(buff.ydata, yall[-100:])
+        assert buff.stats() == data_stats(xall[-100:], yall[-100:])
+    buff.clear()
+    assert len(buff) == 0
+    with pytest.raises(ValueError):
+        buff.append([1, 2], [1])
+
+def test_sorted_index():
+    rng = np.random.default_rng(3)
+    x = np.sort(rng.uniform(0, 100, 5000))
+    y = rng.normal(size=len(x))
+    for xd, yd in ((x, y), (x[::-1], y[::-1])):
+        index = SortedIndex(xd, yd)
+        for xq in rng.uniform(-10, 110, 50):
+            assert index.nearest(xq) == np.argmin(abs(xd - xq))
+        for x0, x1, y0, y1 in rng.uniform(0, 100, (20, 4)):
+            x0, x1 = sorted((x0, x1))
+            y0, y1 = sorted(((y0-50)/25, (y1-50)/25))
+            expected = np.flatnonzero((xd >= x0) & (xd <= x1) &
+                                      (yd >= y0) & (yd <= y1))
+            assert np.array_equal(index.query_box(x0, x1, y0, y1), expected)
+            assert index.count_x(x0, x1) == np.count_nonzero((xd >= x0) & (xd <= x1))
+
+def test_grid_index():
+    rng = np.random.default_rng(4)
+    x = rng.uniform(0, 100, 5000)
+    y = rng.uniform(-1, 1, 5000)
+    y[::100] = np.nan
+    index = GridIndex(x, y)
+    for xq, yq in zip(rng.uniform(-10, 110, 50), rng.uniform(-1.5, 1.5, 50)):
+        dist = ((x - xq)/100.0)**2 + ((y - yq)/2.0)**2
+        assert index.nearest(xq, yq, xscale=100, yscale=2) == np.nanargmin(dist)
+    for x0, x1, y0, y1 in zip(*rng.uniform(0, 1, (4, 20))):
+        x0, x1 = sorted((100*x0, 100*x1))
+        y0, y1 = sorted((2*y0-1, 2*y1-1))
+        with np.errstate(invalid='ignore'):
+            expected = np.flatnonzero((x >= x0) & (x <= x1) &
+                                      (y >= y0) & (y <= y1))
+        assert np.array_equal(index.query_box(x0, x1, y0, y1), expected)
+
+def test_arraycache():
+    cache = ArrayCache(maxbytes=1000)
+    arrays = [np.zeros(50) + i for i in range(4)]    # 400 bytes each
+    cache.put('a', arrays[0])
+    cache.put('b', arrays[1])
+    assert cache.nbytes == 800
+    assert cache.get('a') is arrays[0]       # 'b' is now least recent
+    cache.put('c', arrays[2])
+    assert 'b' not in cache and 'a' in cache and 'c' in cache
+    assert cache.nbytes == 800
+    cache.put('d', (arrays[3], 'label'))
+    assert 'a' not in cache and cache.get('d')[1] == 'label'
+    cache.put('big', np.zeros(200))          # larger than maxbytes
+    assert 'big' not in cache
+    cache.put('n', arrays[0], nbytes=0)
+    assert cache.nbytes == 800 and len(cache) == 3
+    cache.set_maxbytes(500)
+    assert cache.nbytes <= 500 and 'd' in cache
+    cache.clear()
+    assert len(cache) == 0 and cache.nbytes == 0
+    assert cache.get('d', 'missing') == 'missing'
+
+def test_tiledimage():
+    rng = np.random.default_rng(5)
+    for shape in ((301, 257), (130, 97, 3)):
+        data = rng.normal(size=shape)
+        tiles = TiledImage(data, tilesize=32, maxbytes=2**20)
+        assert np.array_equal(tiles.read(), data)
+        for window in ((0, 301, 0, 257), (10, 200, 33, 150), (31, 33, 63, 65),
+                       (100, 130, 90, 97)):
+            y0, y1, x0, x1 = window
+            for step in (1, 2, 3, 8):
+                # the window of the image decimated by step
+                expected = data[::step, ::step][y0//step:-(-y1//step),
+                                                x0//step:-(-x1//step)]
+                assert np.array_equal(tiles.read(window, step=step), expected)
+        assert tiles.read((50, 50, 0, 10)).shape[0] == 0
+
+def test_polygon_mask():
+    rng = np.random.default_rng(6)
+    ny, nx = 120, 150
+    iy, ix = np.mgrid[:ny, :nx]
+    pixels = np.column_stack((ix.ravel(), iy.ravel()))
+    # convex, concave, and self-intersecting polygons, partly outside
+    angles = np.sort(rng.uniform(0, 2*np.pi, 40))
+    radii = rng.uniform(20, 70, 40)
+    polygons = [np.column_stack((75 + 60*np.cos(angles), 60 + 50*np.sin(angles))),
+                np.column_stack((75 + radii*np.cos(angles), 60 + radii*np.sin(angles))),
+                rng.uniform(-20, 160, (12, 2)) + 0.01]
+    for verts in polygons:
+        expected = Path(verts).contains_points(pixels).reshape((ny, nx))
+        assert np.array_equal(polygon_mask(verts, (ny, nx)), expected)
+    assert not polygon_mask([(0, 0), (5, 5)], (10, 10)).any()
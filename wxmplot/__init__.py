@@ -49,3 +49,10 @@ from .histogram import Histogram, compute_histogram_data
 
 if sys.platform.lower() == 'darwin':
     wx.PyApp.IsDisplayAvailable = lambda _: True
+
+def __getattr__(name):
+    # batchrender is imported only when used, for headless rendering
+    if name in ('render_plot', 'render_image', 'render_many'):
+        from . import batchrender
+        return getattr(batchrender, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
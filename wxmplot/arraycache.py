@@ -0,0 +1,74 @@
+#!/usr/bin/python
+"""
+least-recently-used cache for numpy arrays, bounded by total size
+"""
+from collections import OrderedDict
+import numpy as np
+
+def array_nbytes(value):
+    "size in bytes of the numpy arrays in a value, or in a tuple or list of values"
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (tuple, list)):
+        return sum(array_nbytes(v) for v in value)
+    return 0
+
+class ArrayCache:
+    """least-recently-used cache of numpy arrays, or tuples of numpy arrays
+    and other values, holding no more than maxbytes total bytes of arrays.
+
+    Values larger than maxbytes are not cached.  Counts of hits and
+    misses from get() are kept as .hits and .misses.
+    """
+    def __init__(self, maxbytes=512*2**20):
+        self.maxbytes = maxbytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, default=None):
+        "get value for key, or default if not in cache"
+        if key not in self._data:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self._data.move_to_end(key)
+        return self._data[key][0]
+
+    def put(self, key, value, nbytes=None):
+        "put value into cache, evicting least-recently-used values as needed"
+        if nbytes is None:
+            nbytes = array_nbytes(value)
+        self.discard(key)
+        if nbytes > self.maxbytes:
+            return
+        self._data[key] = (value, nbytes)
+        self.nbytes += nbytes
+        while self.nbytes > self.maxbytes and len(self._data) > 0:
+            _, (_, old_nbytes) = self._data.popitem(last=False)
+            self.nbytes -= old_nbytes
+
+    def discard(self, key):
+        "remove key from cache, if present"
+        if key in self._data:
+            _, nbytes = self._data.pop(key)
+            self.nbytes -= nbytes
+
+    def clear(self):
+        "remove all values from cache"
+        self._data.clear()
+        self.nbytes = 0
+
+    def set_maxbytes(self, maxbytes):
+        "set maximum size of cache in bytes, evicting values as needed"
+        self.maxbytes = maxbytes
+        while self.nbytes > self.maxbytes and len(self._data) > 0:
+            _, (_, old_nbytes) = self._data.popitem(last=False)
+            self.nbytes -= old_nbytes
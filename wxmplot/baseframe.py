@@ -113,11 +113,13 @@ Matt Newville <newville@cars.uchicago.edu>""" % __version__
         if self.panel is not None: self.panel.set_ylabel(s)
         self.panel.canvas.draw()
 
-    def save_figure(self, event=None, transparent=False, dpi=600):
-        """ save figure image to file"""
+    def save_figure(self, event=None, transparent=False, dpi=600,
+                    max_pixels=None):
+        """ save figure image to file, on a worker thread.  See
+        BasePanel.save_figure()"""
         if self.panel is not None:
-            self.panel.save_figure(event=event,
-                                   transparent=transparent, dpi=dpi)
+            self.panel.save_figure(event=event, transparent=transparent,
+                                   dpi=dpi, max_pixels=max_pixels)
 
     def configure(self,event=None):
         if self.panel is not None:
@@ -7,21 +7,87 @@ import sys
 import time
 import os
 from math import log10
+from functools import partial
 
 import wx
 from wxutils import get_cwd
 import numpy as np
 import matplotlib
-from matplotlib.widgets import Lasso
 from matplotlib import dates
 from matplotlib.backends.backend_wx import RendererWx
 import pytz
 
-from .utils import Printer, MenuItem
+from .utils import Printer, MenuItem, FigureExport
 
 tzname = os.environ.get('TZ', 'UTC')
 TIMEZONE = pytz.timezone(tzname)
 
+def cursor_date_format(xrange):
+    "strftime format for cursor readout of dates, given the x range in days"
+    if xrange > 12: # 12 days
+        return "%Y-%m-%d"
+    elif xrange > 3: # 3 days
+        return "%Y-%m-%d %H"
+    elif xrange > 0.25: # 6 hours
+        return "%m-%d %H:%M"
+    elif xrange > 0.12: #
+        return "%d %H:%M:%S"
+    elif xrange > 0.01: # 4.4 seconds
+        return "%H:%M:%S.%f"
+    return "%M:%S.%f"
+
+def datetime64_to_num(xdata):
+    """convert numpy datetime64 array to matplotlib date numbers (float days
+    since the matplotlib epoch), with NaT converted to NaN"""
+    xdata = np.asarray(xdata)
+    epoch = np.datetime64(dates.get_epoch(), 'us')
+    out = (xdata.astype('datetime64[us]') - epoch).astype(np.float64)/86400.e6
+    out[np.isnat(xdata)] = np.nan
+    return out
+
+def epoch_to_num(xdata):
+    """convert array of Unix timestamps (seconds since 1970-01-01 UTC)
+    to matplotlib date numbers"""
+    offset = (np.datetime64('1970-01-01T00:00', 'us') -
+              np.datetime64(dates.get_epoch(), 'us')).astype(np.float64)
+    return (np.asarray(xdata, dtype=np.float64) + 1.e-6*offset)/86400.0
+
+def tick_format_str(axis):
+    "format string for the major tick labels of a matplotlib axis"
+    try:
+        ticks = axis.get_major_locator()()
+    except:
+        ticks = [0, 1]
+
+    if len(ticks) < 2:
+        ticks.append(0)
+        ticks.append(1)
+    step = max(2.e-15, abs(np.diff(ticks).mean()))
+    if step > 5e4 or (step < 5.e-4 and ticks.mean() < 5.e-2):
+        fmt = '%.2e'
+    else:
+        ndigs = max(0, 3 - round(log10(1.25*step)))
+        while ndigs >= 0:
+            if np.abs(ticks- np.round(ticks, decimals=ndigs)).max() < 2e-3*step:
+                ndigs -= 1
+            else:
+                break
+        fmt = '%%1.%df' % min(9, ndigs+1)
+    return fmt
+
+def format_tick(x, fmt):
+    "format tick value x with fmt, with shortened exponents"
+    s =  fmt % x
+    s.strip()
+    s = s.replace('+', '')
+    while s.find('e0')>0:
+        s = s.replace('e0','e')
+    if s.endswith('e'):
+        s = s[:-1]
+    while s.find('-0')>0:
+         s = s.replace('-0','-')
+    return s
+
 class BasePanel(wx.Panel):
     """
     wx.Panel component shared by PlotPanel and ImagePanel.
@@ -34,7 +100,8 @@ class BasePanel(wx.Panel):
     """
     def __init__(self, parent, messenger=None,
                  show_config_popup=True, zoom_callback=None,
-                 output_title=None, **kws):
+                 output_title=None, motion_callback=None,
+                 motion_interval=1.0/60, **kws):
 
         wx.Panel.__init__(self, parent, -1, **kws)
 
@@ -48,8 +115,10 @@ class BasePanel(wx.Panel):
         self.popup_menu =  None
         self._yfmt  = self._y2fmt = self._xfmt  = None
         self._y3fmt  = self._y4fmt = None
+        self._tick_formats = {}
         self.use_dates = False
         self.dates_tzinfo = TIMEZONE
+        self._date_formats = None
         self.show_config_popup = show_config_popup
         self.launch_dir  = get_cwd()
 
@@ -57,7 +126,26 @@ class BasePanel(wx.Panel):
         self.user_limits = {}
         self.zoom_ini  = None  # x, y coords for zoom-box
         self.zoom_callback = zoom_callback
+        self.motion_callback = motion_callback
+        self.motion_interval = motion_interval
+        self._motion_time = 0
+        self._motion_timer = None
+        self._motion_event = None
+        self._motion_message = None
+        self.max_zoom_history = 100
+        self._pan_lims = None
+        self.pan_background = None
+        self.pan_shifted = False
+        self.pan_by_shift = True
         self.rbbox = None
+        self.lasso_verts = None
+        self.lasso_points = None
+        self.lasso_color = 'goldenrod'
+        self.overlay_interval = 1.0/60
+        self._overlay_timer = None
+        self._overlay_time = 0
+        self._overlay_box = None
+        self._overlay_npts = 0
         # self.zdc = None
         self.cursor_modes = {}
         self.cursor_mode = 'report'
@@ -65,6 +153,8 @@ class BasePanel(wx.Panel):
         self.wx_renderer = None
         self.motion_sbar = None
         self.printer = Printer(self, title=output_title)
+        self.export_job = None
+        self.export_max_pixels = None
         self.add_cursor_mode('report', motion = self.report_motion,
                              leftdown = self.report_leftdown)
         self.add_cursor_mode('zoom', motion = self.zoom_motion,
@@ -85,6 +175,8 @@ class BasePanel(wx.Panel):
                                 self.__onMouseButtonEvent)
         self.canvas.mpl_connect("key_press_event",
                                 self.__onKeyEvent)
+        self.canvas.mpl_connect("key_release_event",
+                                self.__onKeyRelease)
 
         if os.name == 'posix':
             def swallow_mouse(*args):
@@ -183,10 +275,49 @@ class BasePanel(wx.Panel):
     def write_message(self, s, panel=0):
         """ write message to message handler
         (possibly going to GUI statusbar)"""
+        self._motion_message = None
         self.messenger(s, panel=panel)
 
-    def save_figure(self, event=None, transparent=False, dpi=600):
-        """ save figure image to file"""
+    def write_motion_message(self, s, panel=0):
+        """ write message reporting mouse motion, if it differs
+        from the last such message"""
+        if s != self._motion_message:
+            self.write_message(s, panel=panel)
+            self._motion_message = s
+
+    def skip_motion(self, event):
+        """whether to skip reporting a mouse motion event now, so that motion
+        is reported at most once every motion_interval seconds.  A skipped
+        event is reported when the interval has passed, unless replaced by
+        a later motion event."""
+        if not self.motion_interval:
+            return False
+        self._motion_event = event
+        if self._motion_timer is not None:
+            return True
+        wait = self._motion_time + self.motion_interval - time.time()
+        if wait > 0.001:
+            self._motion_timer = wx.CallLater(int(1000*wait)+1,
+                                              self._report_last_motion)
+            return True
+        self._motion_time = time.time()
+        self._motion_event = None
+        return False
+
+    def _report_last_motion(self):
+        self._motion_timer = None
+        event = self._motion_event
+        if event is not None:
+            self._motion_time = 0
+            self.report_motion(event=event)
+
+    def save_figure(self, event=None, transparent=False, dpi=600,
+                    max_pixels=None):
+        """ save figure image to file, on a worker thread
+
+        with max_pixels (default: self.export_max_pixels), dpi is lowered
+        as needed to keep the image size below max_pixels pixels.
+        """
         file_choices = "PNG (*.png)|*.png|SVG (*.svg)|*.svg|PDF (*.pdf)|*.pdf"
         try:
             ofile = self.conf.title.strip()
@@ -209,16 +340,62 @@ class BasePanel(wx.Panel):
                             style=wx.FD_SAVE|wx.FD_CHANGE_DIR)
 
         if dlg.ShowModal() == wx.ID_OK:
-            path = dlg.GetPath()
-            if hasattr(self, 'fig'):
-                self.fig.savefig(path, transparent=transparent, dpi=dpi)
-            else:
-                self.canvas.print_figure(path, transparent=transparent, dpi=dpi)
-            if (path.find(self.launch_dir) ==  0):
-                path = path[len(self.launch_dir)+1:]
-            self.write_message('Saved plot to %s' % path)
+            self.export_figure(dlg.GetPath(), transparent=transparent,
+                               dpi=dpi, max_pixels=max_pixels)
         os.chdir(orig_dir)
 
+    def export_figure(self, path, transparent=False, dpi=600,
+                      max_pixels=None, progress_callback=None,
+                      done_callback=None):
+        """save figure image to file on a worker thread, from a copy of
+        the figure, returning the FigureExport.  Any export in progress
+        is cancelled.
+
+        Progress is written as messages, and progress_callback(fraction,
+        message) and done_callback(path, status) are called on the GUI
+        thread.  Use cancel_export() (or Escape) to cancel.
+        """
+        self.cancel_export()
+        if max_pixels is None:
+            max_pixels = self.export_max_pixels
+        fig = self.fig if hasattr(self, 'fig') else self.canvas.figure
+
+        def on_progress(fraction, message):
+            self.write_message('Saving %s: %s (%d%%)' %
+                               (self._short_path(path), message,
+                                round(100*fraction)))
+            if callable(progress_callback):
+                progress_callback(fraction, message)
+
+        def on_done(path, status):
+            spath = self._short_path(path)
+            if status == 'saved':
+                self.write_message('Saved plot to %s' % spath)
+            elif status == 'cancelled':
+                self.write_message('Cancelled saving plot to %s' % spath)
+            else:
+                self.write_message('Could not save plot to %s: %s' %
+                                   (spath, status))
+            if callable(done_callback):
+                done_callback(path, status)
+
+        self.export_job = FigureExport(fig, path, dpi=dpi,
+                                       transparent=transparent,
+                                       max_pixels=max_pixels,
+                            progress_callback=partial(wx.CallAfter, on_progress),
+                            done_callback=partial(wx.CallAfter, on_done))
+        return self.export_job.start()
+
+    def cancel_export(self):
+        "cancel saving figure image, if in progress"
+        if self.export_job is not None and self.export_job.is_running():
+            self.export_job.cancel()
+
+    def _short_path(self, path):
+        if path.find(self.launch_dir) == 0:
+            path = path[len(self.launch_dir)+1:]
+        return path
+
     def set_bg(self, color= None):
         if color is None:
             color = '#FBFBFB'
@@ -254,11 +431,7 @@ class BasePanel(wx.Panel):
         pass
 
     def lassoHandler(self, vertices):
-        try:
-            del self.lasso
-            self.canvas.draw_idle()
-        except:
-            pass
+        self.canvas.draw_idle()
 
     def zoom_OK(self, start, stop):
         return True
@@ -319,18 +492,18 @@ class BasePanel(wx.Panel):
         """ default, generic messenger: write to stdout"""
         sys.stdout.write(s)
 
-    def __date_format(self, x):
-        """ formatter for date x-data. primitive, and probably needs
-        improvement, following matplotlib's date methods.
+    def get_date_formats(self):
+        """formats for date x-data, as (tick format, fractional-second
+        format or None, cursor format), computed only when the x view
+        interval changes.
         """
+        span = tuple(self.axes.xaxis.get_view_interval())
+        if self._date_formats is not None and self._date_formats[0] == span:
+            return self._date_formats[1]
 
-        if x < 1: x = 1
-        span = self.axes.xaxis.get_view_interval()
         tmin = max(1.0, span[0])
         tmax = max(2.0, span[1])
-        tmin = dates.num2date(tmin, tz=self.dates_tzinfo).timestamp()
-        tmax = dates.num2date(tmax, tz=self.dates_tzinfo).timestamp()
-        nsec = (tmax - tmin)
+        nsec = 86400.0*(tmax - tmin)
         fmt = "%H:%M\n%S"
         frac = None
         if nsec < 0.1:
@@ -347,6 +520,16 @@ class BasePanel(wx.Panel):
             fmt = "%m/%d\n%H:%M"
         else:
             fmt = "%m/%d"
+        formats = (fmt, frac, cursor_date_format(abs(span[1] - span[0])))
+        self._date_formats = (span, formats)
+        return formats
+
+    def __date_format(self, x):
+        """ formatter for date x-data. primitive, and probably needs
+        improvement, following matplotlib's date methods.
+        """
+        if x < 1: x = 1
+        fmt, frac, _ = self.get_date_formats()
         dtval = dates.num2date(x, tz=self.dates_tzinfo)
         try:
             out = dtval.strftime(fmt)
@@ -360,6 +543,11 @@ class BasePanel(wx.Panel):
                 pass
         return out
 
+    def format_xdate(self, x):
+        "format date x-value for cursor readout, using the cached date formats"
+        fmt = self.get_date_formats()[2]
+        return dates.num2date(x, tz=self.dates_tzinfo).strftime(fmt)
+
     def reset_formats(self):
         self._xfmt = self._yfmt = self._y2fmt = None
         self._y3fmt = self._y4fmt = None
@@ -388,27 +576,18 @@ class BasePanel(wx.Panel):
         return self.__format(y, type='y4')
 
     def set_format_str(self, axis):
-        try:
-            ticks = axis.get_major_locator()()
-        except:
-            ticks = [0, 1]
-
-        if len(ticks) < 2:
-            ticks.append(0)
-            ticks.append(1)
-        step = max(2.e-15, abs(np.diff(ticks).mean()))
-        if step > 5e4 or (step < 5.e-4 and ticks.mean() < 5.e-2):
-            fmt = '%.2e'
-        else:
-            ndigs = max(0, 3 - round(log10(1.25*step)))
-            while ndigs >= 0:
-                if np.abs(ticks- np.round(ticks, decimals=ndigs)).max() < 2e-3*step:
-                    ndigs -= 1
-                else:
-                    break
-            fmt = '%%1.%df' % min(9, ndigs+1)
-        return fmt
-
+        return tick_format_str(axis)
+
+    def get_tick_format(self, axis):
+        """get format string and dict of formatted tick labels for an axis,
+        kept until the view interval, scale, or size of the axis changes"""
+        key = (tuple(axis.get_view_interval()), axis.get_scale(),
+               tuple(axis.axes.bbox.size))
+        cached = self._tick_formats.get(axis, None)
+        if cached is None or cached[0] != key:
+            cached = (key, self.set_format_str(axis), {})
+            self._tick_formats[axis] = cached
+        return cached[1], cached[2]
 
     def __format(self, x, type='x'):
         """ home built tick formatter to use with FuncFormatter():
@@ -417,43 +596,25 @@ class BasePanel(wx.Panel):
 
         also sets self._yfmt/self._xfmt for statusbar
         """
-        fmt, v = '%1.5g','%1.5g'
+        axes = self.fig.get_axes()
         if type == 'y':
             ax = self.axes.yaxis
-            if self._yfmt is None:
-                self._yfmt = self.set_format_str(ax)
-            fmt = self._yfmt
-        elif type == 'y2' and len(self.fig.get_axes()) > 1:
-            ax =  self.fig.get_axes()[1].yaxis
-            if self._y2fmt is None:
-                self._y2fmt = self.set_format_str(ax)
-            fmt = self._y2fmt
-        elif type == 'y3' and len(self.fig.get_axes()) > 2:
-            ax =  self.fig.get_axes()[2].yaxis
-            if self._y3fmt is None:
-                self._y3fmt = self.set_format_str(ax)
-            fmt = self._y3fmt
-        elif type == 'y4' and len(self.fig.get_axes()) > 3:
-            ax =  self.fig.get_axes()[3].yaxis
-            if self._y4fmt is None:
-                self._y4fmt = self.set_format_str(ax)
-            fmt = self._y4fmt
+        elif type == 'y2' and len(axes) > 1:
+            ax = axes[1].yaxis
+        elif type == 'y3' and len(axes) > 2:
+            ax = axes[2].yaxis
+        elif type == 'y4' and len(axes) > 3:
+            ax = axes[3].yaxis
         else:
+            type = 'x'
             ax = self.axes.xaxis
-            if self._xfmt is None:
-                self._xfmt = self.set_format_str(ax)
-            fmt = self._xfmt
-
-        s =  fmt % x
-        s.strip()
-        s = s.replace('+', '')
-        while s.find('e0')>0:
-            s = s.replace('e0','e')
-        if s.endswith('e'):
-            s = s[:-1]
-        while s.find('-0')>0:
-             s = s.replace('-0','-')
-        return s
+        fmt, labels = self.get_tick_format(ax)
+        setattr(self, '_%sfmt' % type, fmt)
+        if x not in labels:
+            if len(labels) > 500:
+                labels.clear()
+            labels[x] = format_tick(x, fmt)
+        return labels[x]
 
     def __onKeyEvent(self, event=None):
         """ handles key events on canvas
@@ -485,6 +646,8 @@ class BasePanel(wx.Panel):
                 self.conf.zoom_style = 'y only'
             elif ckey == 'W':
                 self.conf.zoom_style = 'both x and y'
+        elif key == wx.WXK_ESCAPE:
+            self.cancel_export()
         elif key in (wx.WXK_LEFT, wx.WXK_NUMPAD_LEFT):
             self._onPan(direction='left', shift=shift)
         elif key in (wx.WXK_RIGHT, wx.WXK_NUMPAD_RIGHT):
@@ -494,31 +657,157 @@ class BasePanel(wx.Panel):
         elif key in (wx.WXK_DOWN, wx.WXK_NUMPAD_DOWN):
             self._onPan(direction='down', shift=shift)
 
+    def __onKeyRelease(self, event=None):
+        """ handles key release on canvas: finish panning with a full draw
+        """
+        self.pan_background = None
+        if self.pan_shifted:
+            self.pan_shifted = False
+            self.canvas.draw()
+
+    def push_zoom_lims(self, lims, pan=False):
+        """add limits (dict of axes:[xmin, xmax, ymin, ymax]) to the zoom
+        history.  With pan=True, limits replace those from an immediately
+        preceding pan, so that a run of pan steps is one zoom level.  The
+        history is limited to max_zoom_history levels, keeping the first."""
+        zlims = self.conf.zoom_lims
+        if (pan and len(zlims) > 0 and self._pan_lims is not None and
+            zlims[-1] is self._pan_lims):
+            zlims[-1] = lims
+        else:
+            zlims.append(lims)
+        self._pan_lims = lims if pan else None
+        nextra = len(zlims) - max(2, self.max_zoom_history)
+        if nextra > 0:
+            del zlims[1:1+nextra]
+
     def _onPan(self, direction=None, shift=False):
         if direction not in ('left', 'right', 'up', 'down'):
             return
-
-        axes = self.fig.get_axes()[0]
-        try:
-            if len(self.conf.zoom_lims) > 0:
-                x0, x1, y0, y1 = self.conf.zoom_lims[-1][axes]
-            else:
-                x0, x1 = axes.get_xlim()
-                y0, y1 = axes.get_ylim()
-        except:
+        axes = self.fig.get_axes()
+        if len(axes) < 1:
             return
 
+        # pan by a whole number of pixels, so that the plot can be
+        # redrawn by shifting the saved image of the plot
         step = 0.10 if shift else 0.02
+        width, height = axes[0].bbox.width, axes[0].bbox.height
+        xpix, ypix = 0, 0
         if direction in ('left', 'right'):
-            step *= abs(x1 - x0) * {'right': 1, 'left': -1}[direction]
-            x0, x1 = x0+step, x1+step
-        elif direction in ('up', 'down'):
-            step *= abs(y1 - y0) * {'up': 1, 'down': -1}[direction]
-            y0, y1 = y0+step, y1+step
+            xpix = max(1, int(round(step*width)))
+            if direction == 'right':
+                xpix = -xpix
+        else:
+            ypix = max(1, int(round(step*height)))
+            if direction == 'down':
+                ypix = -ypix
 
-        self.conf.zoom_lims.append({axes: [x0, x1, y0, y1]})
+        lims = {}
+        for ax in axes:
+            try:
+                x0, x1, y0, y1 = self.conf.zoom_lims[-1][ax]
+            except:
+                x0, x1 = ax.get_xlim()
+                y0, y1 = ax.get_ylim()
+            dx = -xpix*(x1-x0)/max(1, width)
+            dy = -ypix*(y1-y0)/max(1, height)
+            lims[ax] = [x0+dx, x1+dx, y0+dy, y1+dy]
+
+        self.push_zoom_lims(lims, pan=True)
         self.set_viewlimits()
-        self.canvas.draw()
+        if not self.pan_by_shift:
+            # panels that draw in set_viewlimits are not shifted
+            return
+        if not self.pan_redraw(xpix, ypix):
+            getattr(self.canvas, 'draw_now', self.canvas.draw)()
+            self.save_pan_background()
+
+    def save_pan_background(self):
+        """save image of the plot area, inset from the axes frame,
+        for redrawing during panning"""
+        self.pan_background = None
+        if not hasattr(self.canvas, 'copy_from_bbox'):
+            return
+        axes = self.fig.get_axes()
+        if len(axes) < 1:
+            return
+        bbox = axes[0].bbox
+        x0, y0, x1, y1 = bbox.extents
+        inset = matplotlib.transforms.Bbox.from_extents(x0+2, y0+2,
+                                                        x1-2, y1-2)
+        try:
+            region = self.canvas.copy_from_bbox(inset)
+        except:
+            return
+        self.pan_background = (region, tuple(bbox.bounds),
+                               tuple(self.canvas.get_width_height()))
+
+    def pan_redraw(self, dx, dy):
+        """redraw plot after panning that moves the plot by dx, dy pixels,
+        by shifting the saved image of the plot area and drawing only the
+        plot area exposed by the pan.  Ticks and labels are not updated
+        until the next full draw.
+
+        Returns False if this cannot be done and a full draw is needed,
+        as for the first step of a pan, log scales, or a resized plot."""
+        if self.pan_background is None:
+            return False
+        region, bounds, size = self.pan_background
+        self.pan_background = None
+        axes = self.fig.get_axes()
+        if (len(axes) < 1 or tuple(axes[0].bbox.bounds) != bounds or
+            tuple(self.canvas.get_width_height()) != size):
+            return False
+        for ax in axes:
+            if ax.get_xscale() != 'linear' or ax.get_yscale() != 'linear':
+                return False
+        width, height = bounds[2:]
+        if abs(dx) >= width-4 or abs(dy) >= height-4:
+            return False
+
+        # the saved image has y increasing downward
+        ex0, ey0, ex1, ey1 = region.get_extents()
+        sx0, sx1 = max(ex0, ex0-dx), min(ex1, ex1-dx)
+        sy0, sy1 = max(ey0, ey0+dy), min(ey1, ey1+dy)
+
+        # exposed strips, in display coordinates
+        x0, y0, x1, y1 = axes[0].bbox.extents
+        pad = 3
+        strips = []
+        if dx > 0:
+            strips.append((x0, y0, x0+dx+pad, y1))
+        elif dx < 0:
+            strips.append((x1+dx-pad, y0, x1, y1))
+        if dy > 0:
+            strips.append((x0, y0, x1, y0+dy+pad))
+        elif dy < 0:
+            strips.append((x0, y1+dy-pad, x1, y1))
+
+        artists = []
+        for ax in axes:
+            for alist in (ax.images, ax.patches, ax.collections, ax.lines):
+                artists.extend(alist)
+        artists.sort(key=lambda a: a.get_zorder())
+
+        self.canvas.restore_region(region, bbox=(sx0, sy0, sx1, sy1),
+                                   xy=(ex0+dx, ey0-dy))
+        for strip in strips:
+            clip = matplotlib.transforms.Bbox.from_extents(*strip)
+            for artist in [axes[0].patch] + artists:
+                if not artist.get_visible():
+                    continue
+                oldclip = artist.get_clip_box()
+                artist.set_clip_box(clip)
+                try:
+                    axes[0].draw_artist(artist)
+                finally:
+                    artist.set_clip_box(oldclip)
+        for spine in axes[0].spines.values():
+            axes[0].draw_artist(spine)
+        self.canvas.blit(axes[0].bbox)
+        self.save_pan_background()
+        self.pan_shifted = True
+        return True
 
     def __onMouseButtonEvent(self, event=None):
         """ general mouse press/release events. Here, event is
@@ -558,6 +847,26 @@ class BasePanel(wx.Panel):
         except:
             pass
 
+    def get_canvas_bitmap(self):
+        "bitmap of the rendered figure to display on the GUI canvas"
+        bmp = self.canvas.bitmap
+        if wx.Platform == '__WXMSW__':
+            if self.wx_renderer is None:
+                self.set_wx_renderer(self.fig)
+            if self.wx_renderer:
+                bmp = bmp.ConvertToImage().ConvertToBitmap()
+        return bmp
+
+    def get_dpi_scale(self):
+        "scale from canvas pixels to wx device context coordinates"
+        dpi_sf = 1.0
+        if wx.Platform != '__WXMSW__':
+            try:
+                dpi_sf = self.canvas.GetDPIScaleFactor()
+            except:
+                dpi_sf = 1.0
+        return dpi_sf
+
     def gui_repaint(self, drawDC=None, origin=None):
         """
         Update the displayed image on the GUI canvas, using the supplied
@@ -569,18 +878,63 @@ class BasePanel(wx.Panel):
             drawDC = wx.ClientDC(self.canvas)
 
         bmp = self.canvas.bitmap
-        if wx.Platform == '__WXMSW__' and origin != 'WXAgg':
-            if self.wx_renderer is None:
-                self.set_wx_renderer(self.fig)
-            if self.wx_renderer:
-                bmp = bmp.ConvertToImage().ConvertToBitmap()
+        if origin != 'WXAgg':
+            bmp = self.get_canvas_bitmap()
 
         drawDC.DrawBitmap(bmp, 0, 0)
-        if self.rbbox is not None:
+        self._overlay_box = None
+        self._overlay_npts = 0
+        self.draw_overlay(drawDC=drawDC)
+
+    def update_overlay(self):
+        """request update of the rubber-band box and lasso outline,
+        drawing at most once every overlay_interval seconds, and always
+        drawing the most recent box and outline"""
+        if self._overlay_timer is not None:
+            return
+        wait = self._overlay_time + self.overlay_interval - time.time()
+        if wait > 0.001:
+            self._overlay_timer = wx.CallLater(int(1000*wait)+1,
+                                               self.draw_overlay)
+        else:
+            self.draw_overlay()
+
+    def draw_overlay(self, drawDC=None):
+        """draw rubber-band box and lasso outline over the displayed image.
+
+        Only the region damaged by the previously drawn box is restored
+        from the figure bitmap, and only new segments of the lasso outline
+        are drawn."""
+        self._overlay_timer = None
+        self._overlay_time = time.time()
+        if not drawDC:
+            drawDC = wx.ClientDC(self.canvas)
+
+        if self._overlay_box is not None and self._overlay_box != self.rbbox:
+            x, y, w, h = self._overlay_box
+            damage = wx.Region(x-2, y-2, w+5, 5)
+            damage.Union(x-2, y+h-2, w+5, 5)
+            damage.Union(x-2, y-2, 5, h+5)
+            damage.Union(x+w-2, y-2, 5, h+5)
+            drawDC.SetDeviceClippingRegion(damage)
+            drawDC.DrawBitmap(self.get_canvas_bitmap(), 0, 0)
+            drawDC.DestroyClippingRegion()
+            self._overlay_box = None
+
+        if self.rbbox is not None and self._overlay_box is None:
             drawDC.SetLogicalFunction(wx.XOR)
             drawDC.SetBrush(wx.Brush('Black', wx.BRUSHSTYLE_TRANSPARENT))
             drawDC.SetPen(wx.Pen('WHITE', 2, wx.SOLID))
             drawDC.DrawRectangle(*self.rbbox)
+            drawDC.SetLogicalFunction(wx.COPY)
+            self._overlay_box = self.rbbox
+
+        points = self.lasso_points
+        if (points is not None and len(points) > 1 and
+            len(points) > self._overlay_npts):
+            drawDC.SetPen(wx.Pen(self.lasso_color, 1, wx.SOLID))
+            drawDC.DrawLines(points[max(0, self._overlay_npts-1):])
+            self._overlay_npts = len(points)
 
     def zoom_motion(self, event=None):
         """motion event handler for zoom mode"""
@@ -597,13 +951,7 @@ class BasePanel(wx.Panel):
         if event.ydata is not None:
             self.y_lastmove = event.ydata
 
-        dpi_sf = 1.0
-        if wx.Platform != '__WXMSW__':
-            try:
-                dpi_sf = self.canvas.GetDPIScaleFactor()
-            except:
-                dpi_sf = 1.0
-
+        dpi_sf = self.get_dpi_scale()
         bheight = self.canvas.figure.bbox.height/dpi_sf
         x0     = min(x, ini_x)/dpi_sf
         ymax   = max(y, ini_y)/dpi_sf
@@ -620,7 +968,7 @@ class BasePanel(wx.Panel):
             x0 = 1 + int(round(limits[0][0]))
 
         self.rbbox = (int(x0), int(y0), int(width), int(height))
-        self.canvas.Refresh()
+        self.update_overlay()
 
 
     def zoom_leftdown(self, event=None):
@@ -652,7 +1000,7 @@ class BasePanel(wx.Panel):
                 ymin, ymax = ax.get_ylim()
                 zlims[ax] = [xmin, xmax, ymin, ymax]
             if len(self.conf.zoom_lims) == 0:
-                self.conf.zoom_lims.append(zlims)
+                self.push_zoom_lims(zlims)
             # for multiple axes, we first collect all the new limits, and
             # only then apply them
             for ax in self.fig.get_axes():
@@ -672,7 +1020,7 @@ class BasePanel(wx.Panel):
                     tlims[ax][2:] = [ymin, ymax]
                 elif self.conf.zoom_style.startswith('y'):
                     tlims[ax][:2] = [xmin, xmax]
-            self.conf.zoom_lims.append(tlims)
+            self.push_zoom_lims(tlims)
             # now apply limits:
             self.set_viewlimits()
 
@@ -683,6 +1031,16 @@ class BasePanel(wx.Panel):
     def lasso_motion(self, event=None):
         """motion event handler for lasso mode"""
         self.report_motion(event=event)
+        if self.lasso_verts is None or event is None:
+            return
+        ax = self.lasso_axes
+        self.lasso_verts.append(tuple(ax.transData.inverted().transform(
+            (event.x, event.y))))
+        dpi_sf = self.get_dpi_scale()
+        bheight = self.canvas.figure.bbox.height
+        self.lasso_points.append((int(event.x/dpi_sf),
+                                  int((bheight-event.y)/dpi_sf)))
+        self.update_overlay()
 
     def lasso_leftdown(self, event=None):
         """leftdown event handler for lasso mode"""
@@ -703,16 +1061,29 @@ class BasePanel(wx.Panel):
                     color = '#%02x%02x%02x' % tuple(rgb)
             except:
                 pass
-            self.lasso = Lasso(event.inaxes, (event.xdata, event.ydata),
-                               self.lassoHandler)
-            self.lasso.line.set_color(color)
+            self.lasso_color = color
+            self.lasso_axes = event.inaxes
+            self.lasso_verts = [(event.xdata, event.ydata)]
+            dpi_sf = self.get_dpi_scale()
+            bheight = self.canvas.figure.bbox.height
+            self.lasso_points = [(int(event.x/dpi_sf),
+                                  int((bheight-event.y)/dpi_sf))]
+            self._overlay_npts = 0
 
     def lasso_leftup(self, event=None):
         """leftup event handler for lasso mode"""
-        pass
+        verts = self.lasso_verts
+        self.lasso_verts = self.lasso_points = None
+        if verts is None:
+            return
+        if event is not None:
+            verts.append(tuple(self.lasso_axes.transData.inverted().transform(
+                (event.x, event.y))))
+        if len(verts) > 2:
+            self.lassoHandler(verts)
 
     def report_motion(self, event=None):
-        if event.inaxes is None:
+        if event.inaxes is None or self.skip_motion(event):
             return
 
         fmt = "X,Y= %g, %g"
@@ -728,7 +1099,9 @@ class BasePanel(wx.Panel):
             except AttributeError:
                 self.motion_sbar = 1
 
-        self.write_message(fmt % (x, y), panel=self.motion_sbar)
+        self.write_motion_message(fmt % (x, y), panel=self.motion_sbar)
+        if callable(self.motion_callback):
+            self.motion_callback(wid=self.GetId(), x=x, y=y)
 
     def Print(self, event=None, **kw):
         self.printer.Print(event=event, **kw)
@@ -0,0 +1,411 @@
+#!/usr/bin/python
+"""
+headless rendering of line plots and images with matplotlib's Agg backend,
+using configurations saved from PlotConfig.get_config() or
+ImageConfig.get_config(), and without a wx.App or any windows.
+
+   render_plot()   render a line plot of one or more traces
+   render_image()  render an image or contour plot of a 2-D array
+   render_many()   render many plots and images with a pool of processes
+
+Plots are styled with a PlotConfig in the same way as for a PlotPanel.  For
+render_many(), large arrays are passed to the worker processes in shared
+memory instead of being pickled.
+"""
+import os
+from io import BytesIO
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.gridspec import GridSpec
+from matplotlib.ticker import FuncFormatter
+from matplotlib.dates import AutoDateLocator, AutoDateFormatter, date2num
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+from .config import PlotConfig
+from .basepanel import tick_format_str, format_tick, datetime64_to_num
+from .imageconf import ImageConfig, ColorMaps
+from .plotpanel import PlotPanel
+
+def unpack_tracedata(tdat):
+    """x data, y data, and options for a trace given as (x, y),
+    or as a dict with 'xdata', 'ydata', and oplot() options"""
+    if isinstance(tdat, dict):
+        opts = dict(tdat)
+        return opts.pop('xdata'), opts.pop('ydata'), opts
+    return tdat[0], tdat[1], {}
+
+
+class AggPlot:
+    """Figure with an Agg canvas for a line plot, styled with a PlotConfig
+    as for a PlotPanel, but without wx.
+
+    Traces are added, and the margins are set, with the same methods
+    as PlotPanel.
+    """
+    add_trace = PlotPanel.add_trace
+    get_yaxes = PlotPanel.get_yaxes
+    get_default_margins = PlotPanel.get_default_margins
+    autoset_margins = PlotPanel.autoset_margins
+
+    def __init__(self, size=(700, 450), dpi=150, config=None, theme='light'):
+        self.dpi = dpi
+        self.fig = Figure((size[0]/dpi, size[1]/dpi), dpi=dpi)
+        self.canvas = FigureCanvasAgg(self.fig)
+        self.gridspec = GridSpec(1, 1)
+        self.axesmargins = (30, 30, 30, 30)
+        self.axes = self.fig.add_subplot(self.gridspec[0])
+        self.use_dates = False
+        self.formats = {}
+        self.conf = PlotConfig(canvas=self.canvas, panel=self, theme=theme)
+        self.conf.set_theme(theme)
+        self.conf.user_limits = {}
+        self.set_formatters(self.axes)
+        if config is not None:
+            config = dict(config)
+            config.pop('window_size', None)
+            self.conf.set_config(delay_draw=True, **config)
+
+    def set_formatters(self, axes):
+        "use PlotPanel tick formats for an axes"
+        for axis in (axes.xaxis, axes.yaxis):
+            def formatter(x, pos, axis=axis):
+                if axis not in self.formats:
+                    self.formats[axis] = tick_format_str(axis)
+                return format_tick(x, self.formats[axis])
+            axis.set_major_formatter(FuncFormatter(formatter))
+
+    def plot(self, traces, title=None, xlabel=None, ylabel=None,
+             y2label=None, y3label=None, y4label=None, show_legend=None,
+             xmin=None, xmax=None, ymin=None, ymax=None):
+        """plot traces, a list of (x, y) pairs or of dicts with 'xdata',
+        'ydata', and trace options, as for PlotPanel.plot_many()"""
+        conf = self.conf
+        for tdat in traces:
+            xdata, ydata, opts = unpack_tracedata(tdat)
+            fill = opts.pop('fill', False)
+            yaxes, axes = self.get_yaxes(opts.get('yaxes', 1),
+                                         side=opts.get('side', None))
+            if axes not in conf.axes_traces:
+                conf.axes_traces[axes] = []
+                conf.data_save[axes] = []
+                if axes is not self.axes:
+                    self.set_formatters(axes)
+            xdata = self.convert_xdata(xdata)
+            self.add_trace(xdata, np.asarray(ydata), **opts)
+            if fill:
+                conf.set_trace_fill(True, trace=conf.ntrace-1, delay_draw=True)
+
+        conf.user_limits[self.axes] = [xmin, xmax, ymin, ymax]
+        conf.set_logscale(delay_draw=True)
+        conf.set_viewlimits()
+        conf.relabel(xlabel=xlabel, ylabel=ylabel, y2label=y2label,
+                     y3label=y3label, y4label=y4label, title=title,
+                     delay_draw=True)
+        conf.set_axes_style(delay_draw=True)
+        conf.enable_grid(delay_draw=True)
+        conf.set_yaxes_tracecolor(delay_draw=True)
+        conf.draw_legend(show=show_legend, delay_draw=True)
+        if conf.auto_margins:
+            self.autoset_margins()
+        else:
+            conf.set_margins(*conf.margins, delay_draw=True)
+
+    def convert_xdata(self, xdata):
+        "convert datetime or datetime64 x data to matplotlib dates"
+        is_dt64 = isinstance(xdata, np.ndarray) and xdata.dtype.kind == 'M'
+        if not (is_dt64 or isinstance(xdata[0], (datetime, np.datetime64))):
+            return np.asarray(xdata)
+        if not self.use_dates:
+            self.use_dates = True
+            locator = AutoDateLocator()
+            self.axes.xaxis.set_major_locator(locator)
+            self.axes.xaxis.set_major_formatter(AutoDateFormatter(locator))
+        if is_dt64 or isinstance(xdata[0], np.datetime64):
+            return datetime64_to_num(xdata)
+        return date2num(xdata)
+
+    def save(self, filename=None, fmt='png', transparent=False):
+        """save figure to a file, returning the file name, or
+        return the figure image as bytes if filename is None"""
+        if filename is not None:
+            self.fig.savefig(filename, transparent=transparent, dpi=self.dpi)
+            return filename
+        buff = BytesIO()
+        self.fig.savefig(buff, format=fmt, transparent=transparent,
+                         dpi=self.dpi)
+        return buff.getvalue()
+
+
+class AggImage(AggPlot):
+    """Figure with an Agg canvas for an image, displayed as for an
+    ImagePanel with settings from ImageConfig.get_config(), but without wx.
+
+    The image is made by an ImageConfig, as for an ImagePanel.  Intensity
+    ranges (int_lo, int_hi) default to the data range, and colormap
+    limits (cmap_lo, cmap_hi) to those for contrast_level.
+    """
+    def __init__(self, size=(525, 450), dpi=100, config=None):
+        self.dpi = dpi
+        self.fig = Figure((size[0]/dpi, size[1]/dpi), dpi=dpi,
+                          facecolor='#FFFFFF')
+        self.canvas = FigureCanvasAgg(self.fig)
+        self.gridspec = GridSpec(1, 1)
+        self.axes = self.fig.add_subplot(self.gridspec[0],
+                                         facecolor='#FFFFFF')
+        self.conf = ImageConfig(axes=self.axes, fig=self.fig,
+                                canvas=self.canvas)
+        self.config = {'interp': 'nearest', 'colormap': 'gray',
+                       'reverse_colormap': False, 'contrast_level': 0,
+                       'flip_ud': False, 'flip_lr': False, 'rot': False,
+                       'log_scale': False, 'show_axis': False,
+                       'tricolor_bg': 'black', 'ncontour_levels': 9,
+                       'style': 'image', 'show_grid': False,
+                       'grid_color': '#807030', 'grid_alpha': 0.5}
+        if config is not None:
+            self.config.update(config)
+
+    def get_cmap(self):
+        "colormap from configuration"
+        name = self.config['colormap']
+        if self.config['reverse_colormap'] and not name.endswith('_r'):
+            name = name + '_r'
+        return ColorMaps.get(name, ColorMaps['gray'])
+
+    def set_intensity_ranges(self):
+        """set intensity ranges and colormap limits from the configuration,
+        or from the data range and contrast level, as for an ImageFrame"""
+        conf, config = self.conf, self.config
+        img = conf.get_data_sample()
+        ncols = 1 if len(img.shape) == 2 else 3
+        clevel = float(config['contrast_level'] or 0)
+        for col in range(ncols):
+            chan = img if ncols == 1 else img[:, :, col]
+            imin, imax = float(chan.min()), float(chan.max())
+            conf.int_lo[col] = imin
+            conf.int_hi[col] = imax
+            if imax == imin:
+                imax = imin + 0.5
+            jmin, jmax = np.percentile(chan, [clevel, 100.0-clevel])
+            conf.cmap_lo[col] = int((jmin-imin)*conf.cmap_range/(imax-imin))
+            conf.cmap_hi[col] = int((jmax-imin)*conf.cmap_range/(imax-imin))
+        for attr in ('int_lo', 'int_hi', 'cmap_lo', 'cmap_hi'):
+            if config.get(attr, None) is not None:
+                getattr(conf, attr)[:] = config[attr][:3]
+
+    def display(self, data, xlabel=None, ylabel=None):
+        """display 2-D array as an image or contour plot, or a 3-D array
+        (ny, nx, 3) as an RGB image"""
+        conf, config = self.conf, self.config
+        img = np.asarray(data)
+        if 1 in img.shape:
+            img = img.squeeze()
+        self.axes.cla()
+        conf.data = img
+        conf.xlab, conf.ylab = xlabel, ylabel
+        if config['flip_ud']:
+            conf.flip_vert()
+        if config['flip_lr']:
+            conf.flip_horiz()
+        rot_level = config.get('rot_level', None)
+        if rot_level is None:
+            rot_level = 1 if config['rot'] else 0
+        for i in range(rot_level % 4):
+            conf.rotate90()
+        xlabel, ylabel = conf.xlab, conf.ylab
+        img = conf.data
+
+        cmap = self.get_cmap()
+        if config['style'] == 'contour' and len(img.shape) == 2:
+            img = img.astype(np.float64)
+            clevel = float(config['contrast_level'] or 0)
+            if clevel > 0:
+                imin, imax = np.percentile(img, [clevel, 100.0-clevel])
+                img = np.clip(img, imin, imax)
+            nlevels = max(2, int(config['ncontour_levels']))
+            levels = np.linspace(img.min(), img.max(), nlevels+1)
+            self.axes.contourf(img, cmap=cmap, levels=levels)
+            contour = self.axes.contour(img, cmap=cmap, levels=levels)
+            xname = 'gray'
+            if cmap.name == 'gray_r':
+                xname = 'Reds_r'
+            elif cmap.name == 'gray':
+                xname = 'Reds'
+            elif cmap.name.endswith('_r'):
+                xname = 'gray_r'
+            contour.set_cmap(ColorMaps[xname])
+            nlog = np.log10(abs(levels[1]-levels[0]) + 1.e-30)
+            fmt = "%.4f"
+            if nlog < -2:
+                fmt = "%%.%df" % (1-nlog)
+            elif nlog > 2:
+                fmt = "%.1f"
+            self.axes.clabel(contour, fontsize=10, inline=1, fmt=fmt)
+        else:
+            conf.interp = config['interp']
+            conf.log_scale = bool(config['log_scale'])
+            conf.tricolor_bg = config['tricolor_bg']
+            conf.set_colormap(config['colormap'],
+                              reverse=config['reverse_colormap'])
+            self.set_intensity_ranges()
+            # the image data is set by ImageConfig.show_data(),
+            # keeping the axes limits for the full image
+            ny, nx = img.shape[:2]
+            conf.image_levels = None
+            conf.image_window = None
+            conf.image = self.axes.imshow(np.zeros((1, 1)), cmap=conf.cmap[0],
+                                          interpolation=conf.interp)
+            self.axes.set_xlim(-0.5, nx-0.5)
+            self.axes.set_ylim(ny-0.5, -0.5)
+            conf.show_data()
+
+        if config['show_axis']:
+            self.axes.set_axis_on()
+            if config['show_grid']:
+                self.axes.grid(True, alpha=config['grid_alpha'],
+                               color=config['grid_color'])
+            else:
+                self.axes.grid(False)
+            left, top, right, bottom = 0.08, 0.96, 0.96, 0.08
+            if xlabel is not None:
+                self.axes.set_xlabel(xlabel)
+                bottom, top = 0.11, 0.96
+            if ylabel is not None:
+                self.axes.set_ylabel(ylabel)
+                left, right = 0.11, 0.96
+        else:
+            self.axes.set_axis_off()
+            left, top, right, bottom = 0.01, 0.99, 0.99, 0.01
+        self.gridspec.update(left=left, top=top, right=right, bottom=bottom)
+        self.axes.set_position(self.axes.get_subplotspec().get_position(self.fig))
+
+
+def render_plot(traces, config=None, size=None, dpi=150, filename=None,
+                fmt='png', transparent=False, **kws):
+    """render a line plot with Agg, without wx
+
+    Arguments
+    ---------
+      traces      list of (x, y) pairs or of dicts with 'xdata', 'ydata',
+                  and trace options, as for PlotPanel.plot_many()
+      config      dict of plot configuration from PlotConfig.get_config()
+      size        image size in pixels [from config 'window_size',
+                  or (700, 450)]
+      dpi         dots per inch [150]
+      filename    name of file to write, or None to return image bytes
+      fmt         image format when returning bytes ['png']
+      transparent whether to use a transparent background [False]
+
+    Other keyword arguments (title, xlabel, ylabel, y2label, show_legend,
+    xmin, xmax, ymin, ymax) are passed to AggPlot.plot().
+
+    Returns filename, or image as bytes
+    """
+    config = dict(config) if config is not None else {}
+    winsize = config.pop('window_size', None)
+    if size is None:
+        size = winsize if winsize is not None else (700, 450)
+    plot = AggPlot(size=size, dpi=dpi, config=config)
+    plot.plot(traces, **kws)
+    return plot.save(filename=filename, fmt=fmt, transparent=transparent)
+
+def render_image(data, config=None, size=(525, 450), dpi=100, filename=None,
+                 fmt='png', transparent=False, **kws):
+    """render an image of a 2-D array, or (ny, nx, 3) RGB array, with Agg,
+    without wx
+
+    Arguments
+    ---------
+      data        array of image data
+      config      dict of image configuration from ImageConfig.get_config()
+      size        image size in pixels [(525, 450)]
+      dpi         dots per inch [100]
+      filename    name of file to write, or None to return image bytes
+      fmt         image format when returning bytes ['png']
+      transparent whether to use a transparent background [False]
+
+    Other keyword arguments (xlabel, ylabel) are passed to
+    AggImage.display().
+
+    Returns filename, or image as bytes
+    """
+    image = AggImage(size=size, dpi=dpi, config=config)
+    image.display(data, **kws)
+    return image.save(filename=filename, fmt=fmt, transparent=transparent)
+
+
+class SharedArray:
+    "reference to a numpy array copied to shared memory, for render_many()"
+    def __init__(self, name, shape, dtype):
+        self.name = name
+        self.shape = shape
+        self.dtype = dtype
+
+def share_arrays(obj, shms, minbytes):
+    """copy numpy arrays of at least minbytes in obj (an array, or a list,
+    tuple, or dict holding arrays) to shared memory, replacing them with
+    SharedArrays.  The SharedMemory instances are appended to shms."""
+    if isinstance(obj, np.ndarray):
+        if obj.nbytes < max(1, minbytes) or obj.dtype.hasobject:
+            return obj
+        shm = shared_memory.SharedMemory(create=True, size=obj.nbytes)
+        shms.append(shm)
+        np.ndarray(obj.shape, dtype=obj.dtype, buffer=shm.buf)[...] = obj
+        return SharedArray(shm.name, obj.shape, obj.dtype.str)
+    if isinstance(obj, dict):
+        return {key: share_arrays(val, shms, minbytes) for key, val in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(share_arrays(val, shms, minbytes) for val in obj)
+    return obj
+
+def attach_arrays(obj):
+    """replace SharedArrays in obj with copies of the arrays in shared memory"""
+    if isinstance(obj, SharedArray):
+        shm = shared_memory.SharedMemory(name=obj.name)
+        try:
+            return np.ndarray(obj.shape, dtype=obj.dtype, buffer=shm.buf).copy()
+        finally:
+            shm.close()
+    if isinstance(obj, dict):
+        return {key: attach_arrays(val) for key, val in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(attach_arrays(val) for val in obj)
+    return obj
+
+def render_job(job):
+    """render one job for render_many(): a dict with 'kind' of 'plot'
+    or 'image' and arguments for render_plot() or render_image()"""
+    job = attach_arrays(job)
+    if job.pop('kind', 'plot') == 'image':
+        return render_image(**job)
+    return render_plot(**job)
+
+def render_many(jobs, max_workers=None, shared_minbytes=2**20):
+    """render many plots and images in parallel with a pool of processes
+
+    Arguments
+    ---------
+      jobs            list of dicts of arguments for render_plot(), or
+                      for render_image() if the dict has 'kind': 'image'
+      max_workers     number of worker processes [number of CPUs]
+      shared_minbytes minimum size in bytes of arrays passed to workers
+                      in shared memory rather than being pickled [1 MB]
+
+    Returns list of results from render_plot() or render_image(),
+    in the order of jobs.
+    """
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    chunksize = max(1, len(jobs)//(4*max_workers))
+    shms = []
+    try:
+        tasks = [share_arrays(job, shms, shared_minbytes) for job in jobs]
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            return list(pool.map(render_job, tasks, chunksize=chunksize))
+    finally:
+        for shm in shms:
+            shm.close()
+            shm.unlink()
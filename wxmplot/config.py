@@ -23,15 +23,21 @@ Valid marker names are:
    'tripod 1','tripod 2'
 
 """
-from copy import copy
+import warnings
+import weakref
 import numpy as np
 import matplotlib
 from matplotlib.font_manager import FontProperties
+from matplotlib.lines import Line2D
 from matplotlib import rc_params, rcParams
+from matplotlib.colors import to_rgba
 import matplotlib.style
 from wxutils.colors import DARK_THEME
 from cycler import cycler
 from .colors import hexcolor, mpl2hexcolor
+from .decimate import minmax_decimate, envelope_decimate
+from .arraycache import ArrayCache
+from .spatialindex import make_index, SortedIndex
 
 SIDE_YAXES = {'left': 1, 'right': 2, 'right2': 3, 'right3': 4}
 
@@ -58,6 +64,9 @@ for k,v in (('no symbol','None'), ('o','o'), ('+','+'), ('x','x'),
             ('tripod 1','1'), ('tripod 2','2')):
     MarkerMap[k] = v
 
+TRACE_PROPS = ('label', 'color', 'alpha', 'style', 'drawstyle', 'linewidth',
+               'marker', 'markersize', 'zorder', 'yaxes', 'fill')
+
 ViewPadPercents = [0.0, 2.5, 5.0, 7.5, 10.0]
 
 linecolors = ('#1f77b4', '#d62728', '#2ca02c', '#ff7f0e', '#9467bd',
@@ -74,6 +83,7 @@ CONFIG_SAVE = ('auto_margins', 'axes_style', 'current_theme',
                'show_legend', 'show_legend_frame', 'textcolor',
                'titlefont', 'traces', 'viewpad', 'xscale', 'yscale',
                'y2scale', 'y3scale', 'y4scale', 'zoom_style',
+               'errorbar_style', 'errorbar_maxpoints',
                'hist_bins', 'hist_density', 'hist_cumulative',
                'hist_histtype', 'hist_orientation', 'hist_align',
                'hist_stacked', 'hist_rwidth', 'bar_width',
@@ -178,9 +188,13 @@ default_config = {'auto_margins': True,
                   'current_theme': 'auto', #== 'dark' if DARK_THEME else 'light'
                   'data_deriv': False,
                   'data_expr': None,
+                  'decimate': False,
                   'draggable_legend': False,
+                  'errorbar_maxpoints': 500,
+                  'errorbar_style': 'auto',
                   'hidewith_legend': True,
                   'legend_loc':  'best',
+                  'legend_maxentries': 20,
                   'legend_onaxis': 'on plot',
                   'linecolors': linecolors,
                   'margins': [0.15, 0.05, 0.05, 0.15],
@@ -221,6 +235,31 @@ def ifnot_none(val, default):
     "return val if val is not None else default"
     return val if val is not None else default
 
+def data_stats(xdata, ydata):
+    """data range for x, y data, ignoring NaNs, as a tuple of
+    (xmin, xmax, ymin, ymax, smallest positive x, smallest positive y)
+
+    the smallest positive values are None if there are no positive values,
+    and None is returned for empty data.
+    """
+    out = []
+    for arr in (xdata, ydata):
+        arr = np.asarray(arr)
+        if arr.size == 0:
+            return None
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', RuntimeWarning)
+                amin, amax = np.nanmin(arr), np.nanmax(arr)
+                apos = np.nanmin(np.where(arr > 0, arr, np.inf))
+        except (TypeError, ValueError):
+            return None
+        if np.isnan(amin) or np.isnan(amax):
+            return None
+        out.append((amin, amax, None if np.isinf(apos) else apos))
+    (xmin, xmax, xpos), (ymin, ymax, ypos) = out
+    return (xmin, xmax, ymin, ymax, xpos, ypos)
+
 
 class LineProps:
     """ abstraction for Line2D properties, closely related to a
@@ -305,6 +344,9 @@ class PlotConfig:
         if self.current_theme is None:
             self.current_theme = 'auto'
         self.legend_map = {}
+        self.legend_entries = {}
+        self.legend_collapsed = set()
+        self.legend_dirty = False
         self.legend_locs = ['best', 'upper right' , 'lower right', 'center right',
                             'upper left', 'lower left',  'center left',
                             'upper center', 'lower center', 'center']
@@ -321,9 +363,16 @@ class PlotConfig:
                             "x log / y linear", "x log / y log")
         self.zoom_choices = ('both x and y', 'x only', 'y only')
         self.zoom_style = self.zoom_choices[0]
+        self.errorbar_choices = ('auto', 'bars', 'band')
         self.data_deriv = False
         self.data_expr  = None
         self.data_save  = {}
+        self.fullres_data = {}
+        self.data_stats = {}
+        self.ringbuffers = {}
+        self.transform_cache = ArrayCache()
+        self.line_index = {}
+        self._marker_index = None
         self.with_data_process = with_data_process
         self.marker_report_data = []
         self.axes_style_choices = ['box', 'open']
@@ -342,10 +391,17 @@ class PlotConfig:
         self.scatter_xdata = None
         self.scatter_ydata = None
         self.scatter_mask = None
+        self.scatter_index = None
+        self.scatter_points = None
+        self.scatter_collection = None
+        self.scatter_shown = None
 
         self.margins = None
         self.mpl_legend  = None
         self.axes_traces = {}
+        self.axes_datarange = {}
+        self.dirty_axes = set()
+        self.scroll_xlims = None
 
         # preload some traces
         self.traces = []
@@ -408,7 +464,7 @@ class PlotConfig:
         self.configdict = cnf
         return cnf
 
-    def set_config(self, **conf):
+    def set_config(self, delay_draw=False, **conf):
         """set configuration values, as from the dictionary in .get_config()
         """
         if 'current_theme' in conf:
@@ -466,12 +522,47 @@ class PlotConfig:
         # yes, we set the theme again at the end of all of this
         # which seems needed sometimes when the theme is 'auto'... hm.
         self.set_theme(self.current_theme)
-        self.canvas.draw()
+        if not delay_draw:
+            self.canvas.draw()
+
+    def set_scatter_selection(self, mask=None, recolor=False):
+        """set colors of the points of the scatterplot collection, with the
+        select colors where mask is True and the normal colors elsewhere.
+
+        Per-point color arrays of the collection are changed only for
+        points whose selection changed, unless recolor is True (as after
+        changing the colors).
+        """
+        coll = self.scatter_collection
+        if coll is None or self.scatter_xdata is None:
+            return
+        npts = len(self.scatter_xdata)
+        if mask is None:
+            mask = np.zeros(npts, dtype=bool)
+        faces, edges = coll.get_facecolor(), coll.get_edgecolor()
+        shown = self.scatter_shown
+        if (recolor or shown is None or len(faces) != npts or
+            len(edges) != npts or edges is faces):
+            coll.set_facecolor(np.tile(to_rgba(self.scatter_normalcolor), (npts, 1)))
+            coll.set_edgecolor(np.tile(to_rgba(self.scatter_normaledge), (npts, 1)))
+            faces, edges = coll.get_facecolor(), coll.get_edgecolor()
+            shown = np.zeros(npts, dtype=bool)
+        unselect = shown & ~mask
+        select = mask & ~shown
+        faces[unselect] = to_rgba(self.scatter_normalcolor)
+        edges[unselect] = to_rgba(self.scatter_normaledge)
+        faces[select] = to_rgba(self.scatter_selectcolor)
+        edges[select] = to_rgba(self.scatter_selectedge)
+        # set the arrays back, so they are kept as the original colors
+        coll.set_facecolor(faces)
+        coll.set_edgecolor(edges)
+        self.scatter_shown = mask.copy()
 
     def reset_lines(self):
         self.lines = [None]*len(self.traces)
         self.dy    = [None]*len(self.traces)
         self.fills = [None]*len(self.traces)
+        self.errorbars = {}
         self.ntrace = 0
         self.marker_report_data = []
         return self.lines
@@ -668,16 +759,116 @@ class PlotConfig:
         trace = self.get_trace(trace)
         prop = self.traces[trace]
 
-        self.set_trace_label(prop.label, trace=trace, delay_draw=True)
-        self.set_trace_linewidth(prop.linewidth, trace=trace, delay_draw=True)
-        self.set_trace_color(prop.color, trace=trace, delay_draw=True)
-        self.set_trace_alpha(prop.alpha, trace=trace, delay_draw=True)
-        self.set_trace_style(prop.style, trace=trace, delay_draw=True)
-        self.set_trace_drawstyle(prop.drawstyle, trace=trace, delay_draw=True)
-        self.set_trace_fill(prop.fill, trace=trace, delay_draw=True)
-        self.set_trace_marker(prop.marker, trace=trace, delay_draw=True)
-        self.set_trace_markersize(prop.markersize, trace=trace, delay_draw=True)
-        self.set_trace_zorder(prop.zorder, trace=trace, delay_draw=True)
+        self.apply_trace_style(trace, force=True, delay_draw=True,
+                               label=prop.label, linewidth=prop.linewidth,
+                               color=prop.color, alpha=prop.alpha,
+                               style=prop.style, drawstyle=prop.drawstyle,
+                               fill=prop.fill, marker=prop.marker,
+                               markersize=prop.markersize)
+
+    def apply_trace_style(self, trace=None, force=False, delay_draw=False,
+                          **props):
+        """set several properties of a trace at once
+
+        props can be any of label, color, alpha, style, drawstyle,
+        linewidth, marker, markersize, zorder, yaxes, and fill, with values
+        as for the corresponding set_trace_*() method.  Only properties that
+        differ from the current LineProps are applied (or all that are given,
+        with force=True), each matplotlib artist for the trace is updated
+        once, and the legend is redrawn once at the end unless delay_draw
+        is True.
+        """
+        trace = self.get_trace(trace)
+        prop = self.traces[trace]
+        for key, val in props.items():
+            if key not in TRACE_PROPS:
+                raise ValueError(f"apply_trace_style(): unknown property '{key}'")
+        if props.get('color', None) is not None:
+            props['color'] = hexcolor(props['color'])
+        if props.get('alpha', None) is not None:
+            props['alpha'] = min(1, max(0, float(props['alpha'])))
+        if 'style' in props and props['style'] not in StyleMap:
+            props['style'] = {v: k for k, v in StyleMap.items()}.get(props['style'], 'solid')
+        if 'drawstyle' in props and props['drawstyle'] not in DrawStyleMap:
+            props['drawstyle'] = 'default'
+        if 'marker' in props and props['marker'] not in MarkerMap:
+            props['marker'] = {v: k for k, v in MarkerMap.items()}.get(props['marker'],
+                                                                     'no symbol')
+        if 'zorder' in props:
+            props['zorder'] = ifnot_none(props['zorder'], 5*(trace+1))
+        if 'yaxes' in props and props['yaxes'] not in (1, 2, 3, 4):
+            props.pop('yaxes')
+
+        changed = {}
+        for key, val in props.items():
+            if val is not None and (force or getattr(prop, key) != val):
+                changed[key] = val
+        if len(changed) == 0:
+            return
+        fill = changed.pop('fill', None)
+        for key, val in changed.items():
+            setattr(prop, key, val)
+
+        mline = self.get_mpline(trace)
+        if mline:
+            line = mline[0]
+            had_marker = line.get_marker() not in (None, 'None', '', ' ')
+            kws = {}
+            for key in ('label', 'zorder', 'markersize'):
+                if key in changed:
+                    kws[key] = changed[key]
+            if 'markersize' in changed and line.get_markeredgewidth() == 0:
+                kws['markeredgewidth'] = 0.75
+            if 'drawstyle' in changed:
+                kws['drawstyle'] = DrawStyleMap[changed['drawstyle']]
+            if 'marker' in changed:
+                kws['marker'] = MarkerMap[changed['marker']]
+            if 'style' in changed:
+                _key, _opts = StyleMap[changed['style']]
+                kws['linestyle'] = _key
+                if _key == '--' and _opts is not None:
+                    kws['dashes'] = _opts
+            line.set(**kws)
+            if 'drawstyle' in changed:
+                line._invalidx = True
+
+            ckws = {}
+            for key in ('color', 'alpha'):
+                if key in changed:
+                    ckws[key] = changed[key]
+            if 'linewidth' in changed:
+                ckws['linewidth'] = changed['linewidth']/2.0
+            if len(ckws) > 0:
+                for comp in mline:
+                    for artist in (comp if hasattr(comp, '__iter__') else [comp]):
+                        try:
+                            artist.set(**ckws)
+                        except AttributeError:
+                            pass
+            # decimation is not used for traces with markers
+            if 'marker' in changed and had_marker != (changed['marker'] != 'no symbol'):
+                self.decimate_line(line)
+
+        if len(self.fills) < trace+1:
+            self.fills.extend([None]*(trace+1))
+        if fill is not None:
+            self.set_trace_fill(fill, trace=trace, delay_draw=True)
+        elif self.fills[trace] is not None:
+            if 'color' in changed:
+                self.fills[trace].set_color(changed['color'])
+            if 'alpha' in changed:
+                self.fills[trace].set_alpha(changed['alpha'])
+        if (fill is None and trace in self.errorbars and
+            ('color' in changed or 'alpha' in changed or 'zorder' in changed
+             or 'linewidth' in changed)):
+            self.draw_errorbars(trace)
+
+        if 'color' in changed or 'yaxes' in changed:
+            self.set_yaxes_tracecolor(delay_draw=True)
+        if ('color' in changed and mline and
+            callable(self.trace_color_callback)):
+            self.trace_color_callback(changed['color'], line=mline)
+        self.update_legend_entry(trace, delay_draw=delay_draw)
 
     def set_trace_color(self, color, trace=None, delay_draw=True):
         trace = self.get_trace(trace)
@@ -696,10 +887,11 @@ class PlotConfig:
 
         if self.fills[trace] is not None:
             self.fills[trace].set_color(color)
+        if trace in self.errorbars:
+            self.draw_errorbars(trace)
 
-        self.set_yaxes_tracecolor(delay_draw=False)
-        if not delay_draw:
-            self.draw_legend()
+        self.set_yaxes_tracecolor(delay_draw=True)
+        self.update_legend_entry(trace, delay_draw=delay_draw)
         if callable(self.trace_color_callback) and mline:
             self.trace_color_callback(color, line=mline)
 
@@ -717,8 +909,9 @@ class PlotConfig:
                     comp.set_alpha(alpha)
         if self.fills[trace] is not None:
             self.fills[trace].set_alpha(alpha)
-        if not delay_draw:
-            self.draw_legend()
+        if trace in self.errorbars:
+            self.draw_errorbars(trace)
+        self.update_legend_entry(trace, delay_draw=delay_draw)
 
     def set_trace_yaxes(self, yaxes=1, side=None, trace=None, delay_draw=False):
         trace = self.get_trace(trace)
@@ -726,6 +919,10 @@ class PlotConfig:
             _yaxes = SIDE_YAXES.get(side, None)
             if _yaxes is not None:
                 yaxes = _yaxes
+        axes = self.canvas.figure.get_axes()
+        for n in (self.traces[trace].yaxes, yaxes):
+            if n in (1, 2, 3, 4) and n <= len(axes):
+                self.set_axes_dirty(axes[n-1])
         self.traces[trace].yaxes = yaxes
         if not delay_draw:
             self.canvas.draw()
@@ -737,6 +934,8 @@ class PlotConfig:
         mline = self.get_mpline(trace)
         if mline:
             mline[0].set_zorder(zorder)
+        if trace in self.errorbars:
+            self.draw_errorbars(trace)
 
         if not delay_draw:
             self.canvas.draw()
@@ -748,8 +947,7 @@ class PlotConfig:
         mline = self.get_mpline(trace)
         if mline:
             mline[0].set_label(label)
-        if not delay_draw:
-            self.draw_legend()
+        self.update_legend_entry(trace, delay_draw=delay_draw)
 
     def set_trace_style(self, style, trace=None, delay_draw=False):
         trace = self.get_trace(trace)
@@ -768,8 +966,7 @@ class PlotConfig:
             mline[0].set_linestyle(_key)
             if _key == '--' and _opts is not None:
                 mline[0].set_dashes(_opts)
-        if not delay_draw:
-            self.draw_legend()
+        self.update_legend_entry(trace, delay_draw=delay_draw)
 
     def set_trace_drawstyle(self, drawstyle, trace=None, delay_draw=False):
         trace = self.get_trace(trace)
@@ -784,8 +981,7 @@ class PlotConfig:
             mline[0].set_drawstyle(DrawStyleMap[drawstyle])
             mline[0]._invalidx = True
 
-        if not delay_draw:
-            self.draw_legend()
+        self.update_legend_entry(trace, delay_draw=delay_draw)
 
     def set_trace_fill(self, fill, trace=None, delay_draw=False):
         trace = self.get_trace(trace)
@@ -832,8 +1028,7 @@ class PlotConfig:
                     if dstyle.startswith('steps-'):
                         dstyle = dstyle[6:]
                     fkws['step'] = dstyle
-                x = this[0].get_xdata()
-                y = this[0].get_ydata()
+                x, y = self.get_line_data(this[0])
                 y2 = 0
                 if dy is not None:
                     y, y2 = y-dy, y+dy
@@ -841,8 +1036,8 @@ class PlotConfig:
                 _fill = axes.fill_between(x, y, y2=y2, **fkws)
 
                 self.fills[trace] = _fill
-        if not delay_draw:
-            self.draw_legend()
+        self.draw_errorbars(trace)
+        self.update_legend_entry(trace, delay_draw=delay_draw)
 
     def set_trace_marker(self, marker, trace=None, delay_draw=False):
         trace = self.get_trace(trace)
@@ -858,10 +1053,13 @@ class PlotConfig:
 
         mline = self.get_mpline(trace)
         if mline:
+            had_marker = mline[0].get_marker() not in (None, 'None', '', ' ')
             mline[0].set_marker(MarkerMap[marker])
+            # decimation is not used for traces with markers
+            if had_marker != (marker != 'no symbol'):
+                self.decimate_line(mline[0])
 
-        if not delay_draw:
-            self.draw_legend()
+        self.update_legend_entry(trace, delay_draw=delay_draw)
 
     def set_trace_markersize(self, markersize, trace=None, delay_draw=False):
         trace = self.get_trace(trace)
@@ -873,8 +1071,7 @@ class PlotConfig:
             if mline[0].get_markeredgewidth() == 0:
                 mline[0].set_markeredgewidth(0.75)
 
-        if not delay_draw:
-            self.draw_legend()
+        self.update_legend_entry(trace, delay_draw=delay_draw)
 
     def set_trace_linewidth(self, linewidth, trace=None, delay_draw=False):
         trace = self.get_trace(trace)
@@ -888,13 +1085,233 @@ class PlotConfig:
                 except AttributeError:
                     pass
 
-        if not delay_draw:
-            self.draw_legend()
+        if trace in self.errorbars:
+            self.draw_errorbars(trace)
+        self.update_legend_entry(trace, delay_draw=delay_draw)
 
     def set_trace_datarange(self, datarange, trace=None):
         pass
 
 
+    def set_line_data(self, line, xdata, ydata, stats=None):
+        """set data for a matplotlib line, keeping the full-resolution
+        data so that the line can show decimated data for the current view
+
+        stats can give the data range (as from data_stats()) if known.
+        """
+        self.fullres_data[line] = (xdata, ydata)
+        self.line_index.pop(line, None)
+        self._marker_index = None
+        if stats is None:
+            stats = data_stats(xdata, ydata)
+        self.data_stats[line] = stats
+        self.decimate_line(line, full_range=True)
+
+    def get_line_stats(self, line):
+        """get data range for a matplotlib line, as from data_stats()"""
+        if line in self.data_stats:
+            return self.data_stats[line]
+        return data_stats(line.get_xdata(), line.get_ydata())
+
+    def reset_line_data(self):
+        """clear full-resolution data, data ranges, and data buffers
+        for all lines"""
+        self.fullres_data = {}
+        self.data_stats = {}
+        self.ringbuffers = {}
+        self.line_index = {}
+        self._marker_index = None
+        self.transform_cache.clear()
+
+    def get_line_data(self, line):
+        """get full-resolution data for a matplotlib line"""
+        if line in self.fullres_data:
+            return self.fullres_data[line]
+        return line.get_xdata(), line.get_ydata()
+
+    def get_line_index(self, line):
+        """get spatial index (see spatialindex.py) of the full-resolution
+        data for a matplotlib line, building it if needed"""
+        if line not in self.line_index:
+            xdata, ydata = self.get_line_data(line)
+            self.line_index[line] = make_index(xdata, ydata)
+        return self.line_index[line]
+
+    def get_markers_near(self, x, y, xtol, ytol):
+        """get entries of marker_report_data within xtol of x and ytol of y
+        (vertical lines only need to be near in x, horizontal lines in y)
+
+        The index of entries is rebuilt when the list is replaced or changes
+        length, and whenever line data is set.
+        """
+        mdat = self.marker_report_data
+        if (self._marker_index is None or self._marker_index[0] is not mdat or
+            self._marker_index[1] != len(mdat)):
+            xm = np.array([np.nan if m[0] is None else m[0] for m in mdat],
+                          dtype=np.float64)
+            ym = np.array([np.nan if m[1] is None else m[1] for m in mdat],
+                          dtype=np.float64)
+            xorder = np.flatnonzero(~np.isnan(xm))
+            xorder = xorder[np.argsort(xm[xorder], kind='stable')]
+            yorder = np.flatnonzero(np.isnan(xm) & ~np.isnan(ym))
+            yorder = yorder[np.argsort(ym[yorder], kind='stable')]
+            always = np.flatnonzero(np.isnan(xm) & np.isnan(ym))
+            self._marker_index = (mdat, len(mdat), xm, ym, xorder, yorder, always)
+        _, _, xm, ym, xorder, yorder, always = self._marker_index
+
+        xsorted = xm[xorder]
+        near = xorder[np.searchsorted(xsorted, x-xtol, side='right'):
+                      np.searchsorted(xsorted, x+xtol, side='left')]
+        near = near[np.isnan(ym[near]) | (abs(ym[near] - y) < ytol)]
+        ysorted = ym[yorder]
+        hnear = yorder[np.searchsorted(ysorted, y-ytol, side='right'):
+                       np.searchsorted(ysorted, y+ytol, side='left')]
+        near = np.sort(np.concatenate((near, hnear, always)))
+        return [mdat[i] for i in near]
+
+    def decimate_line(self, line, full_range=False):
+        """set the data shown by a matplotlib line, reduced with
+        minmax_decimate() to the pixel width of its axes and, unless
+        full_range is True, to the current x view range.
+        """
+        if line not in self.fullres_data:
+            return
+        xdata, ydata = self.fullres_data[line]
+        if (self.decimate and line.axes is not None and
+            line.get_marker() in (None, 'None', '', ' ')):
+            ax = line.axes
+            xmin = xmax = None
+            if not full_range:
+                xmin, xmax = sorted(ax.get_xlim())
+            xdata, ydata = minmax_decimate(xdata, ydata, ax.bbox.width,
+                                           xmin=xmin, xmax=xmax,
+                                           xlog=(ax.get_xscale() == 'log'))
+        line.set_data(xdata, ydata)
+
+    def decimate_lines(self, axes=None):
+        """reset decimated data for all lines on an axes (default: all axes)"""
+        if axes is None:
+            axes = self.canvas.figure.get_axes()
+        else:
+            axes = [axes]
+        for ax in axes:
+            for line in ax.get_lines():
+                self.decimate_line(line)
+
+    def set_decimate(self, decimate=True):
+        """set whether to use min/max decimation of traces for display"""
+        self.decimate = bool(decimate)
+        self.decimate_lines()
+
+    def remove_errorbars(self, trace):
+        """remove displayed uncertainties for a trace"""
+        if trace not in self.errorbars:
+            return
+        container, artists, view = self.errorbars.pop(trace)
+        if container is not None:
+            artists = [container]
+        for artist in artists:
+            try:
+                artist.remove()
+            except (ValueError, AttributeError, NotImplementedError):
+                pass
+
+    def draw_errorbars(self, trace=None, update=False):
+        """draw uncertainties self.dy for a trace (default: all traces)
+
+        With errorbar_style 'bars', an error bar is drawn for every point.
+        With 'band', the range y-dy to y+dy is drawn as a band, reduced to
+        the pixel width of the axes with envelope_decimate().  With 'auto',
+        error bars are drawn for the visible points if there are no more
+        than errorbar_maxpoints of them, and a band is drawn otherwise.
+        Filled traces show the range with the fill instead.
+
+        Bars and bands are drawn for the view extended by its width on
+        each side.  With update=True, as for a change of view limits, they
+        are only redrawn if the style to use changes, if the data changes,
+        if the view moves outside the range drawn, or if a band is zoomed
+        by more than a factor of 2.
+        """
+        if trace is None:
+            for trace in range(len(self.dy)):
+                if self.dy[trace] is not None or trace in self.errorbars:
+                    self.draw_errorbars(trace, update=update)
+            return
+        if trace >= len(self.dy) or self.dy[trace] is None:
+            self.remove_errorbars(trace)
+            return
+        mline = self.get_mpline(trace)
+        if not mline or mline[0].axes is None or self.traces[trace].fill:
+            self.remove_errorbars(trace)
+            return
+        line, ax, prop = mline[0], mline[0].axes, self.traces[trace]
+        xmin, xmax = sorted(ax.get_xlim())
+        xlog = ax.get_xscale() == 'log'
+        index = self.get_line_index(line)
+
+        style = self.errorbar_style
+        if not isinstance(index, SortedIndex):
+            style = 'bars'
+        elif style == 'auto':
+            nvisible = index.count_x(xmin, xmax)
+            style = 'bars' if nvisible <= self.errorbar_maxpoints else 'band'
+
+        # x range to draw: all points for bars without auto, else the
+        # view extended by its width on each side
+        if style == 'bars' and self.errorbar_style == 'bars':
+            x0, x1 = -np.inf, np.inf
+        elif xlog and xmin > 0:
+            x0, x1 = xmin*xmin/xmax, xmax*xmax/xmin
+        else:
+            x0, x1 = 2*xmin - xmax, 2*xmax - xmin
+        data = (self.fullres_data.get(line), self.dy[trace])
+
+        if update and trace in self.errorbars:
+            view = self.errorbars[trace][2]
+            if (view[0] == style and view[4][0] is data[0] and
+                view[4][1] is data[1] and view[1] <= xmin and xmax <= view[2]):
+                span = xmax - xmin
+                if style == 'bars' or (0.5*view[3] <= span <= 2*view[3]):
+                    return
+        self.remove_errorbars(trace)
+
+        xdata, ydata = self.get_line_data(line)
+        xdata, ydata = np.asarray(xdata), np.asarray(ydata)
+        try:
+            dy = np.broadcast_to(np.asarray(self.dy[trace], dtype=np.float64),
+                                 ydata.shape)
+        except ValueError:
+            return
+
+        if style == 'bars':
+            if np.isfinite(x0) or np.isfinite(x1):
+                drawn = index.query_box(x0, x1, -np.inf, np.inf)
+                xdata, ydata, dy = xdata[drawn], ydata[drawn], dy[drawn]
+            container = ax.errorbar(xdata, ydata, yerr=dy, fmt='none',
+                                    ecolor=prop.color, alpha=prop.alpha,
+                                    elinewidth=prop.linewidth/2.0,
+                                    zorder=prop.zorder, label='_nolegend_')
+            artists = list(container.lines[1]) + list(container.lines[2])
+        else:
+            xd, ylo, yhi = envelope_decimate(xdata, ydata-dy, ydata+dy,
+                                             3*ax.bbox.width, xmin=x0,
+                                             xmax=x1, xlog=xlog)
+            container = None
+            artists = [ax.fill_between(xd, ylo, yhi, color=prop.color,
+                                       alpha=0.3*prop.alpha, linewidth=0,
+                                       zorder=prop.zorder-0.5,
+                                       label='_nolegend_')]
+        view = (style, x0, x1, xmax - xmin, data)
+        self.errorbars[trace] = (container, artists, view)
+
+    def set_errorbar_style(self, style='auto', delay_draw=False):
+        """set how uncertainties are displayed, one of errorbar_choices"""
+        if style in self.errorbar_choices:
+            self.errorbar_style = style
+        self.draw_errorbars()
+        if not delay_draw:
+            self.canvas.draw()
+
     def get_mpl_line(self, trace=None):
         this = self.get_mpline(self.get_trace(trace))
         if this is None:
@@ -1044,6 +1461,16 @@ class PlotConfig:
             labs.append(xl)
         labs = tuple(labs)
 
+        # collapse legend for very many traces
+        self.legend_collapsed = set()
+        nmax = max(2, self.legend_maxentries)
+        if self.show_legend and len(lins) > nmax:
+            self.legend_collapsed = set(lins[nmax-1:])
+            more = Line2D([], [], linestyle='None', marker='None')
+            labs = labs[:nmax-1] + (f'... and {len(lins)-nmax+1} more traces',)
+            lins = lins[:nmax-1] + [more]
+            traces = traces[:nmax-1] + [None]
+
         lgn = axes[-1].legend
         if self.legend_onaxis.startswith('off'):
             lgn = self.canvas.figure.legend
@@ -1061,19 +1488,57 @@ class PlotConfig:
             if self.draggable_legend:
                 self.mpl_legend.set_draggable(True, update='loc')
             self.legend_map = {}
+            self.legend_entries = {}
             for legline, legtext, mainline, trace in zip(self.mpl_legend.get_lines(),
                                                          self.mpl_legend.get_texts(),
                                                          lins, traces):
+                legtext.set_color(self.textcolor)
+                if trace is None:
+                    continue
                 legline.set_pickradius(20)
                 legtext.set_picker(5)
                 self.legend_map[legline] = (mainline, trace, legline, legtext)
                 self.legend_map[legtext] = (mainline, trace, legline, legtext)
-                legtext.set_color(self.textcolor)
+                self.legend_entries[mainline] = (legline, legtext)
 
+        self.legend_dirty = False
         self.set_added_text_size()
         if not delay_draw:
             self.canvas.draw()
 
+    def update_legend_entry(self, trace=None, delay_draw=False):
+        """update the legend entry for a trace after its label or style
+        has changed.  The entry is changed in place if possible.  If the
+        trace must be added to or removed from the legend, the legend is
+        rebuilt, or marked to be rebuilt at the next draw with delay_draw.
+        """
+        trace = self.get_trace(trace)
+        mline = self.get_mpline(trace)
+        lgn = self.mpl_legend
+        if self.show_legend and lgn is None:
+            self.legend_dirty = True
+        elif self.show_legend and mline:
+            line = mline[0]
+            label = line.get_label()
+            shown = (label != '_nolegend_' and len(label) > 0)
+            entry = self.legend_entries.get(line, None)
+            if entry is not None and shown:
+                legline, legtext = entry
+                legtext.set_text(label)
+                trans = legline.get_transform()
+                handler = lgn.get_legend_handler(lgn.get_legend_handler_map(),
+                                                 line)
+                if handler is not None:
+                    handler.update_prop(legline, line, lgn)
+                    legline.set_transform(trans)
+                    legline.set_markersize(lgn.markerscale*line.get_markersize())
+            elif shown != (entry is not None or line in self.legend_collapsed):
+                self.legend_dirty = True
+        if self.legend_dirty and not delay_draw:
+            self.draw_legend()
+        elif not delay_draw:
+            self.canvas.draw()
+
     def set_legend_location(self, loc, onaxis):
         "set legend location"
         self.legend_onaxis = 'on plot'
@@ -1095,27 +1560,57 @@ class PlotConfig:
         for ax in self.canvas.figure.get_axes():
             for trace, lines in enumerate(ax.get_lines()):
                 try:
-                    dats = copy(self.data_save[ax][trace])
+                    xsave, ysave = self.data_save[ax][trace]
                 except:
                     return
-                xd, yd = np.asarray(dats[0][:]), np.asarray(dats[1][:])
-                if expr == 'Y*X':
-                    yd = yd * xd
-                elif expr == 'Y*X^2':
-                    yd = yd * xd * xd
-                elif expr == 'Y^2':
-                    yd = yd * yd
-                elif expr == 'SQRT(Y)':
-                    yd = np.sqrt(yd)
-                elif expr == '1/Y':
-                    yd = 1./yd
-                if self.data_deriv:
-                    yd = np.gradient(yd)/np.gradient(xd)
-                lines.set_ydata(yd)
-                lines.set_xdata(xd)
+                xd, yd, stats = self.transform_data(xsave, ysave, expr=expr,
+                                                    deriv=self.data_deriv)
+                self.set_line_data(lines, xd, yd, stats=stats)
 
         self.unzoom(full=True)
 
+    def transform_data(self, xdata, ydata, expr=None, deriv=False):
+        """apply a data expression (one of data_expressions, in upper case)
+        and optionally the derivative to saved x, y data, returning
+        (x, y, data_stats) for the transformed data.
+
+        Results are kept in transform_cache, keyed by the identity of the
+        saved data arrays, the expression, and deriv, so that switching
+        between expressions only computes each result once.  The saved
+        arrays are only weakly referenced by the cache.
+        """
+        key = (id(xdata), id(ydata), expr, bool(deriv))
+        cached = self.transform_cache.get(key)
+        if cached is not None and cached[0]() is xdata and cached[1]() is ydata:
+            xd, yd, stats = cached[2:]
+            return (xdata if xd is None else xd,
+                    ydata if yd is None else yd, stats)
+
+        xd, yd = np.asarray(xdata), np.asarray(ydata)
+        if expr == 'Y*X':
+            yd = yd * xd
+        elif expr == 'Y*X^2':
+            yd = yd * xd * xd
+        elif expr == 'Y^2':
+            yd = yd * yd
+        elif expr == 'SQRT(Y)':
+            yd = np.sqrt(yd)
+        elif expr == '1/Y':
+            yd = 1./yd
+        if deriv:
+            yd = np.gradient(yd)/np.gradient(xd)
+        stats = data_stats(xd, yd)
+        # the saved data is held by weak reference, so that replaced data
+        # is not kept alive by the cache, and is not stored as a result
+        try:
+            refs = (weakref.ref(xdata), weakref.ref(ydata))
+        except TypeError:
+            return xd, yd, stats
+        self.transform_cache.put(key, refs + (None if xd is xdata else xd,
+                                              None if yd is ydata else yd,
+                                              stats))
+        return xd, yd, stats
+
     def unzoom(self, full=False, delay_draw=False):
         """unzoom display 1 level or all the way"""
         if full:
@@ -1123,46 +1618,68 @@ class PlotConfig:
             self.zoom_lims = []
         elif len(self.zoom_lims) > 0:
             self.zoom_lims.pop()
+        self.scroll_xlims = None
         self.set_viewlimits()
         if not delay_draw:
             self.canvas.draw()
 
-    def set_viewlimits(self):
+    def set_axes_dirty(self, axes=None):
+        """mark an axes (default: all axes) as having changed data, so that
+        set_viewlimits(dirty_only=True) will reset its limits"""
+        if axes is None:
+            self.dirty_axes.update(self.canvas.figure.get_axes())
+        else:
+            self.dirty_axes.add(axes)
+
+    def get_axes_datarange(self, axes):
+        """get data range [xmin, xmax, ymin, ymax] of the lines on an axes,
+        and smallest positive x and y values"""
+        limits = [None, None, None, None]
+        x_minpos = y_minpos = None
+        if axes in self.axes_traces:
+            for lines in axes.get_lines():
+                if lines.get_label() == '_nolegend_':
+                    continue
+                stats = self.get_line_stats(lines)
+                if stats is None:
+                    continue
+                xmin, xmax, ymin, ymax, xpos, ypos = stats
+                if xpos is not None:
+                    x_minpos = xpos if x_minpos is None else min(x_minpos, xpos)
+                if ypos is not None:
+                    y_minpos = ypos if y_minpos is None else min(y_minpos, ypos)
+                if limits == [None, None, None, None]:
+                    limits = [xmin, xmax, ymin, ymax]
+                else:
+                    limits = [min(limits[0], xmin), max(limits[1], xmax),
+                              min(limits[2], ymin), max(limits[3], ymax)]
+        return limits, x_minpos, y_minpos
+
+    def set_viewlimits(self, dirty_only=False):
+        """set view limits for all axes from the data ranges, padding,
+        user limits and zoom limits, returning the list of limits.
+
+        With dirty_only=True, only axes marked with set_axes_dirty() (as
+        for oplot() and update_line()) have their data range recomputed and
+        their limits set, so that other axes keep their transforms, tick
+        locations, and decimated lines.
+        """
         all_limits = []
         x_minpos = None
         y_minpos = None
-        for ax in self.canvas.figure.get_axes():
-            limits = [None, None, None, None]
-            if ax in self.axes_traces:
-                try:
-                    for trace, lines in enumerate(ax.get_lines()):
-                        if lines.get_label() == '_nolegend_':
-                            continue
-                        x, y = lines.get_xdata(), lines.get_ydata()
-                        try:
-                            if not isinstance(y, np.ndarray):
-                                y = np.array(y)
-                            if not isinstance(x, np.ndarray):
-                                x = np.array(x)
-                            if y_minpos is None:
-                                y_minpos= min(y[np.where(y>0)])
-                            else:
-                                y_minpos= min(y_minpos, min(y[np.where(y>0)]))
-                            if x_minpos is None:
-                                x_minpos= min(x[np.where(x>0)])
-                            else:
-                                x_minpos= min(x_minpos, min(x[np.where(x>0)]))
-                        except:
-                            pass
-                        if limits == [None, None, None, None]:
-                            limits = [min(x), max(x), min(y), max(y)]
-                        else:
-                            limits = [min(limits[0], min(x)),
-                                      max(limits[1], max(x)),
-                                      min(limits[2], min(y)),
-                                      max(limits[3], max(y))]
-                except ValueError:
-                    pass
+        all_axes = self.canvas.figure.get_axes()
+        xlims = {ax: ax.get_xlim() for ax in all_axes}
+        updated = []
+        for ax in all_axes:
+            dirty = not dirty_only or ax in self.dirty_axes
+            if dirty or ax not in self.axes_datarange:
+                self.axes_datarange[ax] = self.get_axes_datarange(ax)
+            limits, xpos, ypos = self.axes_datarange[ax]
+            limits = limits[:]
+            if xpos is not None:
+                x_minpos = xpos if x_minpos is None else min(x_minpos, xpos)
+            if ypos is not None:
+                y_minpos = ypos if y_minpos is None else min(y_minpos, ypos)
             if x_minpos is None:
                 x_minpos = 1.e-8
             if y_minpos is None:
@@ -1202,18 +1719,61 @@ class PlotConfig:
                 for i, val in  enumerate(self.user_limits[ax]):
                     if val is not None:
                         limits[i] = val
+            # scrolling x range for streaming data, from append_data()
+            if self.scroll_xlims is not None:
+                limits[0], limits[1] = self.scroll_xlims
 
             if len(self.zoom_lims) > 0:
                 limits = self.zoom_lims[-1][ax]
             all_limits.append(limits)
+
+        # axes sharing x (as twinned y axes) take x limits from the last of
+        # them, from the data ranges of all axes, not only the dirty ones
+        xlimits = {}
+        for ax, limits in zip(all_axes, all_limits):
+            for sib in ax.get_shared_x_axes().get_siblings(ax):
+                xlimits[sib] = (limits[0], limits[1])
+
+        for ax, limits in zip(all_axes, all_limits):
+            xlim = xlimits.get(ax, (limits[0], limits[1]))
+            if dirty_only and ax not in self.dirty_axes:
+                if None not in xlim and tuple(ax.get_xlim()) != xlim:
+                    try:
+                        ax.set_xlim(xlim, emit=True)
+                    except:
+                        pass
+                continue
+            updated.append(ax)
+            if dirty_only and None not in limits and None not in xlim:
+                if (tuple(ax.get_xlim()) == xlim and
+                    tuple(ax.get_ylim()) == (limits[2], limits[3])):
+                    continue
             try:
-                ax.set_xlim((limits[0], limits[1]), emit=True)
+                ax.set_xlim(xlim, emit=True)
             except:
                 pass
             try:
                 ax.set_ylim((limits[2], limits[3]), emit=True)
             except:
                 pass
+        self.dirty_axes.clear()
+
+        # clean axes need new decimated lines if the (shared) x range changed
+        for ax in all_axes:
+            if ax not in updated and ax.get_xlim() != xlims[ax]:
+                updated.append(ax)
+        if self.decimate:
+            for ax in updated:
+                self.decimate_lines(ax)
+        if self.errorbar_style != 'bars':
+            if dirty_only:
+                for ax in updated:
+                    for trace in self.axes_traces.get(ax, []):
+                        if (trace < len(self.dy) and
+                            (self.dy[trace] is not None or trace in self.errorbars)):
+                            self.draw_errorbars(trace, update=True)
+            else:
+                self.draw_errorbars(update=True)
         return all_limits
 
     def set_logscale(self, xscale=None, yscale=None, y2scale=None,
@@ -1242,7 +1802,7 @@ class PlotConfig:
             except:
                 axes.set_xscale('linear')
         if not delay_draw:
-            self.process_data()
+            self.unzoom(full=True)
 
     def get_viewpads(self):
         o = [round(i*100.0) for i in ViewPadPercents]
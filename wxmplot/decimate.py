@@ -0,0 +1,127 @@
+#!/usr/bin/python
+"""
+data reduction for display of line traces with very many points.
+
+For a line drawn on an Axes that is N pixels wide, only the first, last,
+minimum, and maximum value in each pixel column can be seen, so a trace
+with millions of points can be replaced by one with at most 4*N points
+with no visible change (the "M4" reduction).
+"""
+import numpy as np
+
+def minmax_decimate(xdata, ydata, npix, xmin=None, xmax=None, xlog=False):
+    """min/max (M4) reduction of x, y data for display
+
+    Args:
+       xdata (array):  x values, which should be monotonic
+       ydata (array):  y values
+       npix (int):     number of pixel columns for display
+       xmin (float or None): lowest visible x value [lowest x]
+       xmax (float or None): highest visible x value [highest x]
+       xlog (bool):    whether pixel columns are spaced in log(x) [False]
+
+    Returns:
+       xdata, ydata for the visible x range, reduced to the first, last,
+       minimum, and maximum point for each pixel column.
+
+    Notes:
+       data with fewer than 4*npix points or with x values that are not
+       monotonic are returned unchanged.  One point on either side of
+       the visible range is kept so that lines run to the edge of the plot.
+    """
+    xdata, ydata = np.asarray(xdata), np.asarray(ydata)
+    npix = max(1, int(npix))
+    sel = _select_columns(xdata, (ydata,), npix, xmin, xmax, xlog)
+    if sel is None:
+        return xdata, ydata
+    xd, (yd,), starts = sel
+    if starts is None:
+        return xd, yd
+    npts = len(xd)
+    stops = np.append(starts[1:], npts)
+
+    ymin = np.fmin.reduceat(yd, starts)
+    ymax = np.fmax.reduceat(yd, starts)
+    segment = np.repeat(np.arange(len(starts)), stops-starts)
+
+    keep = [starts, stops-1]
+    for yext in (ymin, ymax):
+        index = np.flatnonzero(yd == yext[segment])
+        _, first = np.unique(segment[index], return_index=True)
+        keep.append(index[first])
+    keep = np.unique(np.concatenate(keep))
+    return xd[keep], yd[keep]
+
+def envelope_decimate(xdata, ylow, yhigh, npix, xmin=None, xmax=None,
+                      xlog=False):
+    """reduction of a band between ylow and yhigh for display
+
+    Args:
+       xdata (array):  x values, which should be monotonic
+       ylow (array):   lower y values of band
+       yhigh (array):  upper y values of band
+       npix (int):     number of pixel columns for display
+       xmin (float or None): lowest visible x value [lowest x]
+       xmax (float or None): highest visible x value [highest x]
+       xlog (bool):    whether pixel columns are spaced in log(x) [False]
+
+    Returns:
+       xdata, ylow, yhigh for the visible x range, with the first and
+       last x value of each pixel column, and the lowest ylow and highest
+       yhigh for that pixel column, so that the reduced band covers the
+       full band.
+
+    Notes:
+       as for minmax_decimate(), data with fewer than 4*npix points or
+       with x values that are not monotonic are returned unchanged.
+    """
+    xdata, ylow, yhigh = np.asarray(xdata), np.asarray(ylow), np.asarray(yhigh)
+    npix = max(1, int(npix))
+    sel = _select_columns(xdata, (ylow, yhigh), npix, xmin, xmax, xlog)
+    if sel is None:
+        return xdata, ylow, yhigh
+    xd, (ylo, yhi), starts = sel
+    if starts is None:
+        return xd, ylo, yhi
+    stops = np.append(starts[1:], len(xd))
+    ylo = np.fmin.reduceat(ylo, starts)
+    yhi = np.fmax.reduceat(yhi, starts)
+    xout = np.column_stack((xd[starts], xd[stops-1])).ravel()
+    return xout, np.repeat(ylo, 2), np.repeat(yhi, 2)
+
+def _select_columns(xdata, ydata, npix, xmin, xmax, xlog):
+    """sort x data and the arrays in the tuple ydata into increasing x,
+    restrict to the visible x range, and find the start index of each
+    pixel column.
+
+    Returns None if the data should be used unchanged, (x, ydata, None)
+    if the data in the visible range should not be reduced, and
+    (x, ydata, starts) otherwise.
+    """
+    npts = len(xdata)
+    if (npts <= 4*npix or xdata.ndim != 1 or
+        any(len(y) != npts or y.ndim != 1 for y in ydata)):
+        return None
+
+    xd = xdata
+    if xd[0] > xd[-1]:
+        xd, ydata = xd[::-1], tuple(y[::-1] for y in ydata)
+    if np.any(np.diff(xd) < 0):
+        return None
+
+    i0, i1 = 0, npts
+    if xmin is not None:
+        i0 = max(0, np.searchsorted(xd, xmin, side='left') - 1)
+    if xmax is not None:
+        i1 = min(npts, np.searchsorted(xd, xmax, side='right') + 1)
+    xd, ydata = xd[i0:i1], tuple(y[i0:i1] for y in ydata)
+    npts = len(xd)
+    if npts <= 4*npix or not xd[-1] > xd[0]:
+        return xd, ydata, None
+
+    if xlog and xd[0] > 0:
+        edges = np.geomspace(xd[0], xd[-1], npix+1)
+    else:
+        edges = np.linspace(xd[0], xd[-1], npix+1)
+    starts = np.unique(np.searchsorted(xd, edges[:-1], side='left'))
+    return xd, ydata, starts
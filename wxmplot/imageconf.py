@@ -10,6 +10,7 @@ import numpy as np
 import yaml
 
 from matplotlib.ticker import FuncFormatter
+from matplotlib.colors import ListedColormap
 
 from wxutils import (get_cwd, LabeledTextCtrl, SimpleText,
                      Button, Check, Choice, HLine, FloatSpin, MenuItem,
@@ -17,6 +18,9 @@ from wxutils import (get_cwd, LabeledTextCtrl, SimpleText,
 
 from .colors import register_custom_colormaps, hexcolor, hex2rgb, mpl_color
 from .config import ifnot_none
+from .arraycache import ArrayCache, array_nbytes
+from .utils import image_pyramid
+from .tiledimage import TiledImage, is_out_of_core
 from .plotconfigframe import autopack
 
 DVSTYLE = dv.DV_SINGLE|dv.DV_VERT_RULES|dv.DV_ROW_LINES
@@ -114,12 +118,27 @@ class ImageConfig:
         self.tricolor_mode = 'rgb'
         self.int_lo = [0, 0, 0]
         self.int_hi = [1, 1, 1]
-        self.data = None
+        self._data = None
+        self.data_generation = 0
+        self.stage_cache = ArrayCache()
+        self.image_levels = None
+        self.image_window = None
+        self.image_level = 0
+        self.pyramid = None
+        self.pyramid_mode = 'mean'
+        self.pyramid_minpixels = 2**22
+        self.pyramid_minsize = 256
+        self.tiles = None
+        self.tile_cachebytes = 256*2**20
+        self.sample_pixels = 2**20
+        self.preview_size = 1024
+        self.window_margin = 0.25
+        self.window_minpad = 32
+        self.lut_levels = 65536
         self.xdata = None
         self.ydata = None
         self.xlab = 'X'
         self.ylab = 'Y'
-        self.indices = None
         self.title = 'image'
         self.style = 'image'
         self.highlight_areas = []
@@ -127,8 +146,11 @@ class ImageConfig:
         self.contour_levels = None
         self.contour_labels = True
         self.cursor_mode = 'zoom'
-        self.zoombrush = wx.Brush('#040410',  wx.SOLID)
-        self.zoompen   = wx.Pen('#101090',  3, wx.SOLID)
+        self.zoombrush = self.zoompen = None
+        # wx brushes and pens need a wx.App, which headless rendering lacks
+        if wx.GetApp() is not None:
+            self.set_zoombrush('#040410', wx.SOLID)
+            self.set_zoompen('#101090', wx.SOLID)
         self.zoom_choices = ('both x and y', 'x only', 'y only')
         self.zoom_style = 'both'
         self.zoom_lims = []
@@ -147,6 +169,7 @@ class ImageConfig:
         self.scalebar_color = '#EEEE99'
         self._xfmt = None
         self._yfmt = None
+        self._tick_formats = {}
         self.set_formatters()
 
     def set_colormap(self, name, reverse=False, icol=0):
@@ -172,7 +195,10 @@ class ImageConfig:
                 xname = 'gray_r'
             self.contour.set_cmap(ColorMaps[xname])
         if hasattr(self, 'image'):
-            self.image.set_cmap(curr_cmap)
+            if self.image_levels is not None:
+                self.image.set_cmap(self.make_lut_cmap(self.image_levels))
+            else:
+                self.image.set_cmap(curr_cmap)
 
         if hasattr(self, 'highlight_areas') and hasattr(curr_cmap, '_lut'):
             for area, mask, text, label in self.highlight_areas:
@@ -188,15 +214,351 @@ class ImageConfig:
                 except AttributeError:
                     pass
 
+    @property
+    def data(self):
+        return self._data
+
+    @data.setter
+    def data(self, data):
+        """set image data.  Replacing the data, as by flipping or rotating,
+        starts a new data_generation and clears processed data and tiles."""
+        if data is self._data:
+            return
+        self._data = data
+        self.data_generation += 1
+        self.stage_cache.clear()
+        self.tiles = None
+
+    def get_stage(self, key, func):
+        """get a processed version of the image data from stage_cache,
+        computing it with func() if needed.
+
+        Results are keyed by data_generation and key, so are recomputed
+        when data is replaced.  Call stage_cache.clear() after changing
+        data in place.
+        """
+        key = (self.data_generation,) + key
+        if key in self.stage_cache:
+            return self.stage_cache.get(key)
+        out = func()
+        # the data itself is held by self.data, and is not counted
+        nbytes = 0 if out is self.data else array_nbytes(out)
+        self.stage_cache.put(key, out, nbytes=nbytes)
+        return out
+
+    def make_pyramid(self, data=None):
+        """make image pyramid for data (default: current data), as
+        (data, levels), with levels downsampled by factors of 2**level.
+        This may be slow, and can be run in a thread."""
+        if data is None:
+            data = self.data
+        return data, image_pyramid(data, mode=self.pyramid_mode,
+                                   minsize=self.pyramid_minsize)
+
+    def set_pyramid(self, pyramid):
+        "set image pyramid from make_pyramid(), if for the current data"
+        if pyramid is not None and pyramid[0] is self.data:
+            self.pyramid = pyramid
+
+    def get_tiles(self):
+        """get TiledImage for out-of-core data (np.memmap or other array-like
+        data), or None for in-memory data"""
+        if not is_out_of_core(self.data):
+            return None
+        if self.tiles is None or self.tiles.data is not self.data:
+            self.tiles = TiledImage(self.data, maxbytes=self.tile_cachebytes)
+        return self.tiles
+
+    def get_data_sample(self):
+        """image data, or for out-of-core data a sample of blocks of it, for
+        statistics such as min, max, and percentiles"""
+        tiles = self.get_tiles()
+        if tiles is None:
+            return self.data
+        return self.get_stage(('sample', self.sample_pixels),
+                              lambda: tiles.sample(maxpixels=self.sample_pixels))
+
+    def get_level_data(self, level=0):
+        "image data for a level of the image pyramid"
+        if level == 0 or self.pyramid is None or self.pyramid[0] is not self.data:
+            return self.data
+        return self.pyramid[1][level]
+
+    def get_pyramid_level(self):
+        """get the coarsest level of the image pyramid that still has at
+        least one pixel per screen pixel for the current view.  Out-of-core
+        data is read from decimated tiles for all levels."""
+        if self.data is None or self.axes is None:
+            return 0
+        ny, nx = self.data.shape[:2]
+        if self.get_tiles() is not None:
+            nlevels = 1 + max(0, int(np.log2(max(1, min(ny, nx)/
+                                                  self.pyramid_minsize))))
+        elif self.pyramid is not None and self.pyramid[0] is self.data:
+            nlevels = len(self.pyramid[1])
+        else:
+            return 0
+        xmin, xmax, ymin, ymax = self.datalimits
+        xsize = nx if xmin is None or xmax is None else abs(xmax - xmin)
+        ysize = ny if ymin is None or ymax is None else abs(ymax - ymin)
+        bbox = self.axes.bbox
+        scale = min(xsize/max(1, bbox.width), ysize/max(1, bbox.height))
+        level = 0
+        while level+1 < nlevels and 2**(level+1) <= scale:
+            level += 1
+        return level
+
+    def get_level_window(self, window, level=0):
+        "convert window of the full image to a window of a pyramid level"
+        if window is None or level == 0:
+            return window
+        f = 2**level
+        y0, y1, x0, x1 = window
+        return (y0//f, -(-y1//f), x0//f, -(-x1//f))
+
+    def get_window_data(self, window=None, level=0):
+        """image data for a window (y0, y1, x0, x1) of the full image, or
+        the full image for None, from a level of the image pyramid.
+        Out-of-core data is read in tiles, taking every 2**level pixel."""
+        tiles = self.get_tiles()
+        if tiles is not None:
+            return tiles.read(window, step=2**level)
+        data = self.get_level_data(level)
+        if window is None:
+            return data
+        y0, y1, x0, x1 = self.get_level_window(window, level)
+        return data[y0:y1, x0:x1]
+
+    def get_data_window(self):
+        """get window (y0, y1, x0, x1) of image data to process to show the
+        current view (datalimits), or None for the full image.
+
+        The window includes a margin of window_margin times the view size
+        on each side, so that small pans can be shown without processing
+        more data.  The current window (image_window) is kept while it
+        covers the view and is not much larger than needed.
+        """
+        if self.data is None:
+            return None
+        ny, nx = self.data.shape[:2]
+        xmin, xmax, ymin, ymax = self.datalimits
+        if xmin is None or xmax is None or ymin is None or ymax is None:
+            return None
+        xmin, xmax = sorted((xmin, xmax))
+        ymin, ymax = sorted((ymin, ymax))
+        x0, x1 = max(0, int(np.floor(xmin))), min(nx, int(np.ceil(xmax))+1)
+        y0, y1 = max(0, int(np.floor(ymin))), min(ny, int(np.ceil(ymax))+1)
+        if x0 >= x1 or y0 >= y1:
+            return None
+        xpad = max(self.window_minpad, int(self.window_margin*(x1-x0)))
+        ypad = max(self.window_minpad, int(self.window_margin*(y1-y0)))
+        window = (max(0, y0-ypad), min(ny, y1+ypad),
+                  max(0, x0-xpad), min(nx, x1+xpad))
+        area = (window[1]-window[0])*(window[3]-window[2])
+
+        current = self.image_window
+        if current is None:
+            current = (0, ny, 0, nx)
+        if (current[0] <= y0 and y1 <= current[1] and
+            current[2] <= x0 and x1 <= current[3] and
+            (current[1]-current[0])*(current[3]-current[2]) <= 4*area):
+            return self.image_window
+        if area > 0.5*nx*ny:
+            return None
+        return window
+
+    def get_data_range(self):
+        """min and max of image data, with log scaling if set, estimated
+        from a sample for out-of-core data"""
+        sample = self.get_data_sample()
+        dmin, dmax = self.get_stage(('range',),
+                                    lambda: (sample.min(), sample.max()))
+        if self.log_scale:
+            with np.errstate(invalid='ignore', divide='ignore'):
+                dmin, dmax = np.log10(1 + 9.0*dmin), np.log10(1 + 9.0*dmax)
+        return dmin, dmax
+
+    def get_scaled_data(self, window=None, level=0):
+        "image data for a window, with log scaling if log_scale is set"
+        if not self.log_scale:
+            return self.get_window_data(window, level)
+        return self.get_stage(('log', window, level),
+                    lambda: np.log10(1 + 9.0*self.get_window_data(window, level)))
+
+    def get_intensity_range(self, col=0):
+        "intensity range for a color channel, with log scaling if set"
+        imin = float(self.int_lo[col])
+        imax = float(self.int_hi[col])
+        if self.log_scale:
+            imin = np.log10(1 + 9.0*imin)
+            imax = np.log10(1 + 9.0*imax)
+        return imin, imax
+
+    def get_normalized_data(self, col=None, window=None, level=0):
+        """image data (or one color channel of it) for a window, scaled to
+        the intensity range, with log scaling if set"""
+        imin, imax = self.get_intensity_range(0 if col is None else col)
+        def normalize():
+            img = self.get_scaled_data(window=window, level=level)
+            if col is not None:
+                img = img[:, :, col]
+            return (img - imin)/(imax - imin + 1.e-8)
+        return self.get_stage(('norm', self.log_scale, col, imin, imax,
+                               window, level), normalize)
+
+    def get_index_data(self, window=None, level=0):
+        """2D image data for a window, with log scaling if set, as indices
+        into a lookup table, returned as (index, vmin, step, nlevels), with
+        index a uint8 or uint16 array and index i standing for the value
+        vmin + i*step.
+
+        Integer data with a small enough range is indexed exactly,  other
+        data is quantized to lut_levels levels over the range of the full
+        image, so that windows share one lookup table.  None is returned
+        for data that cannot be indexed, as for non-finite values.
+        """
+        return self.get_stage(('index', self.log_scale, self.lut_levels,
+                               window, level),
+                              lambda: self._make_index_data(window, level))
+
+    def _make_index_data(self, window=None, level=0):
+        if self.data is None or len(self.data.shape) != 2 or self.data.size == 0:
+            return None
+        dmin, dmax = self.get_data_range()
+        if not (np.isfinite(dmin) and np.isfinite(dmax)):
+            return None
+        data = self.get_window_data(window, level)
+        if self.log_scale:
+            data = np.log10(1 + 9.0*data)
+        if (np.issubdtype(data.dtype, np.integer) and
+            int(dmax) - int(dmin) < self.lut_levels):
+            nlevels = int(dmax) - int(dmin) + 1
+            dtype = np.uint8 if nlevels <= 256 else np.uint16
+            if dmin == 0 and data.dtype == dtype and self.get_tiles() is None:
+                index = data
+            else:
+                # the range may be from a sample, for out-of-core data
+                index = np.clip(data.astype(np.int64) - int(dmin), 0, nlevels - 1)
+                index = index.astype(dtype)
+            return index, float(dmin), 1.0, nlevels
+        if dmax <= dmin:
+            return np.zeros(data.shape, dtype=np.uint8), float(dmin), 0.0, 1
+        nlevels = min(self.lut_levels, 65536)
+        dtype = np.uint8 if nlevels <= 256 else np.uint16
+        step = (float(dmax) - float(dmin))/(nlevels - 1)
+        index = np.clip((data - float(dmin))/step + 0.5, 0, nlevels - 1)
+        index = index.astype(dtype)
+        return index, float(dmin), step, nlevels
+
+    def make_lut_cmap(self, levels, col=0):
+        """make colormap for index data from get_index_data(), applying
+        the intensity range and colormap limits to the lookup table"""
+        _, vmin, step, nlevels = levels
+        imin, imax = self.get_intensity_range(col)
+        mlo = self.cmap_lo[col]/(1.0*self.cmap_range)
+        mhi = self.cmap_hi[col]/(1.0*self.cmap_range)
+        vals = (vmin + step*np.arange(nlevels) - imin)/(imax - imin + 1.e-8)
+        vals = np.clip((vals - mlo)/(mhi - mlo + 1.e-8), 0, 1)
+        return ListedColormap(self.cmap[col](vals))
+
+    def set_image_window(self, window, shape, level=0):
+        """set extent of image to place data of the given shape, from a
+        level of the image pyramid, at window or at the origin for None,
+        keeping the axes limits"""
+        self.image_window = window
+        self.image_level = level
+        if window is None:
+            window = (0, shape[0], 0, shape[1])
+        else:
+            window = self.get_level_window(window, level)
+        y0, y1, x0, x1 = [2**level*i for i in window]
+        if self.image.origin == 'upper':
+            extent = (x0-0.5, x1-0.5, y1-0.5, y0-0.5)
+        else:
+            extent = (x0-0.5, x1-0.5, y0-0.5, y1-0.5)
+        if tuple(self.image.get_extent()) != extent:
+            axes = self.image.axes
+            xlim, ylim = axes.get_xlim(), axes.get_ylim()
+            self.image.set_extent(extent)
+            axes.set_xlim(xlim, emit=False, auto=None)
+            axes.set_ylim(ylim, emit=False, auto=None)
+
+    def set_image_levels(self, levels, col=0, window=None, level=0):
+        """show index data from get_index_data() in image, with colors
+        from a lookup table, so that only the table needs to be rebuilt
+        when intensity range or colormap change"""
+        if self.image_levels is None or self.image_levels[0] is not levels[0]:
+            self.image.set_data(levels[0])
+            self.image.set_clim(-0.5, levels[3] - 0.5)
+        self.set_image_window(window, levels[0].shape, level=level)
+        self.image_levels = levels
+        self.image.set_cmap(self.make_lut_cmap(levels, col=col))
+
+    def set_image_data(self, img, col=0, window=None, level=0):
+        """show data for window and pyramid level, normalized to the range
+        0 to 1, in image"""
+        if self.image_levels is not None:
+            self.image_levels = None
+            self.image.set_cmap(self.cmap[col])
+            self.image.set_clim(0, 1)
+        self.image.set_data(img)
+        self.set_image_window(window, img.shape, level=level)
+
+    def show_data(self):
+        """show image data for the current view (datalimits) in image,
+        with log scaling, intensity ranges, colormap limits, and
+        interpolation applied.
+
+        Only the data around the view is processed, at the coarsest pyramid
+        level needed for the screen, and a lookup table on index data is
+        used when possible, so that only the table is rebuilt for new
+        intensity ranges.
+        """
+        if self.data is None:
+            return
+        window = self.get_data_window()
+        level = self.get_pyramid_level()
+        if len(self.data.shape) == 2:
+            levels = self.get_index_data(window=window, level=level)
+            if levels is not None:
+                self.set_image_levels(levels, col=0, window=window, level=level)
+            else:
+                img = self.get_normalized_data(window=window, level=level)
+                mlo = self.cmap_lo[0]/(1.0*self.cmap_range)
+                mhi = self.cmap_hi[0]/(1.0*self.cmap_range)
+                self.set_image_data(np.clip((img - mlo)/(mhi - mlo + 1.e-8), 0, 1),
+                                    window=window, level=level)
+        else:
+            img = self.get_window_data(window, level)
+            inew = np.empty(img.shape, dtype=np.float64)
+            for ic in range(3):
+                mlo = self.cmap_lo[ic]/(1.0*self.cmap_range)
+                mhi = self.cmap_hi[ic]/(1.0*self.cmap_range)
+                chan = self.get_normalized_data(col=ic, window=window, level=level)
+                inew[:,:,ic] = np.clip((chan - mlo)/(mhi - mlo + 1.e-8), 0, 1)
+            if img.shape[2] > 3:
+                inew[:,:,3:] = self.get_scaled_data(window=window, level=level)[:,:,3:]
+            if self.tricolor_bg.startswith('wh'):
+                inew = self.tricolor_white_bg(inew)
+            self.set_image_data(inew, window=window, level=level)
+        self.image.set_interpolation(self.interp)
+
     def get_highlight_color(self, mask, cmap):
         """get color for highlight to provide decent contrast with data"""
         rgb = [210, 190, 50]
         if self.data is not None:
-            drange = np.ptp(self.data) + 1.e-9
-            if len(self.data.shape) == 3 and len(mask.shape) == 2:
-                mask.shape = (mask.shape[0], mask.shape[1], 1)
-            dmask = np.where(abs(mask * self.data) > (drange*1.e-9))
-            dcolor = cmap(self.data[dmask].mean()/(drange))
+            drange = np.ptp(self.get_data_sample()) + 1.e-9
+            # read only the data around the masked area
+            rows, cols = np.where(mask.reshape(mask.shape[:2]))
+            if len(rows) == 0:
+                rows, cols = np.array([0]), np.array([0])
+            window = (rows.min(), rows.max()+1, cols.min(), cols.max()+1)
+            data = np.asarray(self.get_window_data(window))
+            mask = mask[window[0]:window[1], window[2]:window[3]]
+            if len(data.shape) == 3 and len(mask.shape) == 2:
+                mask = mask.reshape((mask.shape[0], mask.shape[1], 1))
+            dmask = np.where(abs(mask * data) > (drange*1.e-9))
+            dcolor = cmap(data[dmask].mean()/(drange))
             rgb = [int(i*240)^255 for i in dcolor[:3]]
             if rgb[0] == rgb[1] and rgb[1] == rgb[2]: # greyscale
                 rgb = [int(rgb[0]+210)%255,
@@ -204,16 +566,29 @@ class ImageConfig:
                        int(rgb[0]+50)%255]
         return '#%02x%02x%02x' % (rgb[0], rgb[1], rgb[2])
 
+    def transform_image(self, func):
+        """replace data with func(data) for a flip or rotation func, as
+        np.flipud, applying func to each level of the image pyramid too,
+        so that it stays in use.  For odd sizes, the blocks of a level may
+        be offset by less than one block from those of the new data."""
+        pyramid = self.pyramid
+        valid = pyramid is not None and pyramid[0] is self.data
+        self.data = func(self.data)
+        self.pyramid = None
+        if valid:
+            levels = [self.data] + [func(level) for level in pyramid[1][1:]]
+            self.pyramid = (self.data, levels)
+
     def flip_vert(self):
         "flip image along vertical axis (up/down)"
-        self.data = np.flipud(self.data)
+        self.transform_image(np.flipud)
         if self.ydata is not None:
             self.ydata = self.ydata[::-1]
         self.flip_ud = not self.flip_ud
 
     def flip_horiz(self):
         "flip image along horizontal axis (left/right)"
-        self.data = np.fliplr(self.data)
+        self.transform_image(np.fliplr)
         if self.xdata is not None:
             self.xdata = self.xdata[::-1]
         self.flip_lr = not self.flip_lr
@@ -226,7 +601,7 @@ class ImageConfig:
             self.ydata = self.ydata[:]
         self.xdata, self.ydata = self.ydata, self.xdata
         self.xlab, self.ylab = self.ylab, self.xlab
-        self.data = np.rot90(self.data)
+        self.transform_image(np.rot90)
         self.rot_level += 1
         if self.rot_level == 4:
             self.rot_level = 0
@@ -234,6 +609,7 @@ class ImageConfig:
     def reset_formats(self):
         "reset formats for x/y axis"
         self._xfmt = self._yfmt = None
+        self._tick_formats = {}
 
     def set_formatters(self):
         if self.axes is not None:
@@ -277,6 +653,17 @@ class ImageConfig:
             fmt = '%%1.%df' % min(9, ndigs+1)
         return fmt
 
+    def get_tick_format(self, axis, dat):
+        """get format string and dict of formatted tick labels for an axis,
+        kept until the view interval or size of the axis changes, or
+        until reset_formats()"""
+        key = (tuple(axis.get_view_interval()), tuple(axis.axes.bbox.size))
+        cached = self._tick_formats.get(axis, None)
+        if cached is None or cached[0] != key:
+            cached = (key, self.set_format_str(axis, dat), {})
+            self._tick_formats[axis] = cached
+        return cached[1], cached[2]
+
     def _format(self, x, pos, dtype='x'):
         """ home built tick formatter to use with FuncFormatter():
         x     value to be formatted
@@ -289,19 +676,18 @@ class ImageConfig:
             dat  = self.ydata
             if dat is None:
                 dat = np.arange(self.data.shape[0])
-            if self._yfmt is None:
-                self._yfmt = self.set_format_str(ax, dat)
-            fmt = self._yfmt
-
+            fmt, labels = self.get_tick_format(ax, dat)
+            self._yfmt = fmt
         else:
             ax = self.axes.xaxis
             dat = self.xdata
             if dat is None:
                 dat = np.arange(self.data.shape[1])
-            if self._xfmt is None:
-                self._xfmt = self.set_format_str(ax, dat)
-            fmt = self._xfmt
+            fmt, labels = self.get_tick_format(ax, dat)
+            self._xfmt = fmt
 
+        if x in labels:
+            return labels[x]
         try:
             s =  fmt % dat[int(x)]
         except:
@@ -312,6 +698,9 @@ class ImageConfig:
             s = s.replace('e0','e')
         while s.find('-0')>0:
             s = s.replace('-0','-')
+        if len(labels) > 500:
+            labels.clear()
+        labels[x] = s
         return s
 
     def relabel(self):
@@ -406,11 +795,17 @@ class ImageConfig:
 
     def get_config(self):
         """get dictionary of configuration options"""
-        out = {'reverse_colormap': self.cmap_reverse}
-        for attr in ('interp', 'colormap', 'contrast_level', 'flip_ud',
-                     'flip_lr', 'rot', 'tricolor_bg', 'ncontour_levels',
-                     'title', 'style'):
+        cmap_name = getattr(self.cmap[0], 'name', 'gray')
+        if cmap_name.endswith('_r'):
+            cmap_name = cmap_name[:-2]
+        out = {'reverse_colormap': self.cmap_reverse, 'colormap': cmap_name,
+               'rot': self.rot_level != 0}
+        for attr in ('interp', 'contrast_level', 'flip_ud', 'flip_lr',
+                     'rot_level', 'log_scale', 'show_axis', 'tricolor_bg',
+                     'ncontour_levels', 'title', 'style'):
             out[attr] = getattr(self, attr)
+        for attr in ('int_lo', 'int_hi', 'cmap_lo', 'cmap_hi'):
+            out[attr] = [float(v) for v in getattr(self, attr)]
         return out
 
 class ImageConfigFrame(wx.Frame):
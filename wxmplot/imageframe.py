@@ -24,6 +24,7 @@ from .baseframe import BaseFrame
 from .plotframe import PlotFrame
 from .colors import rgb2hex, mpl_color
 from .utils import LabeledTextCtrl, MenuItem, pack, gformat
+from .tiledimage import is_out_of_core
 
 
 CURSOR_MENULABELS = {'zoom':  ('Zoom to Rectangle\tCtrl+B',
@@ -424,7 +425,8 @@ Keyboard Shortcuts:   (For Mac OSX, replace 'Ctrl' with 'Apple')
         if subtitles is not None:
             self.subtitles = subtitles
         cmode = self.config_mode.lower()[:3]
-        img = np.array(img)
+        if not is_out_of_core(img):
+            img = np.array(img)
 
         if len(img.shape) == 3:
             ishape = img.shape
@@ -776,6 +778,8 @@ Keyboard Shortcuts:   (For Mac OSX, replace 'Ctrl' with 'Apple')
 
     def onDataChange(self, data, x=None, y=None, col='int', **kw):
         conf = self.panel.conf
+        if data is conf.data:
+            data = conf.get_data_sample()
         if len(data.shape) == 2: # intensity map
             imin, imax = data.min(), data.max()
             conf.int_lo[0] = imin
@@ -815,7 +819,7 @@ Keyboard Shortcuts:   (For Mac OSX, replace 'Ctrl' with 'Apple')
                 contrast_level = clevel
 
         conf = self.panel.conf
-        img  = self.panel.conf.data
+        img  = conf.get_data_sample()
         if contrast_level is None:
             contrast_level = 0
         conf.contrast_level = contrast_level = float(contrast_level)
@@ -864,7 +868,7 @@ Keyboard Shortcuts:   (For Mac OSX, replace 'Ctrl' with 'Apple')
 
     def show_histogram(self, event=None):
         conf = self.panel.conf
-        img  = conf.data
+        img  = conf.get_data_sample()
 
         title = f'{self.GetTitle()}: Histogram'
         dat, color = None, None
@@ -903,11 +907,13 @@ Keyboard Shortcuts:   (For Mac OSX, replace 'Ctrl' with 'Apple')
         if dlg.ShowModal() == wx.ID_OK:
             self.cmap_panels[0].cmap_canvas.print_figure(dlg.GetPath(), dpi=600)
 
-    def save_figure(self,event=None, transparent=True, dpi=600):
-        """ save figure image to file"""
+    def save_figure(self, event=None, transparent=True, dpi=600,
+                    max_pixels=None):
+        """ save figure image to file, on a worker thread.  See
+        BasePanel.save_figure()"""
         if self.panel is not None:
-            self.panel.save_figure(event=event,
-                                   transparent=transparent, dpi=dpi)
+            self.panel.save_figure(event=event, transparent=transparent,
+                                   dpi=dpi, max_pixels=max_pixels)
 
 
     def ExportTextFile(self, fname, title='unknown map'):
@@ -528,7 +528,7 @@ class ImageMatrixFrame(BaseFrame):
 
         dp = self.dual_panel
         try:
-            dp.conf.image.set_data(img)
+            dp.conf.set_image_data(img)
         except:
             dp.conf.data = img
         im1_zoom = self.img1_panel.conf.zoom_lims[-1]
@@ -538,6 +538,7 @@ class ImageMatrixFrame(BaseFrame):
             if self.sel_mask is not None:
                 dp.conf.image = dp.axes.imshow(img, cmap=dp.conf.cmap[0],
                                                interpolation=dp.conf.interp)
+                dp.conf.image_levels = dp.conf.image_window = None
             dp.canvas.draw()
         else:
             self.dual_panel.display(img)
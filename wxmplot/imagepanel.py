@@ -4,8 +4,8 @@
 ##
 
 import time
-import wx
 from threading import Thread
+import wx
 
 import numpy as np
 import matplotlib
@@ -17,7 +17,8 @@ from matplotlib.patches import Rectangle
 
 from .imageconf import ImageConfig, RGB_COLORS
 from .basepanel import BasePanel
-from .utils import inside_poly, MenuItem
+from .utils import polygon_mask, MenuItem
+from .tiledimage import is_out_of_core
 from .plotframe import PlotFrame
 from .colors import wxcol2hex, get_color
 
@@ -47,6 +48,9 @@ class ImagePanel(BasePanel):
 
         self.conf = ImageConfig()
         self.conf.title = output_title
+        # set_viewlimits redraws the image, so panning does not
+        # shift the saved image of the plot
+        self.pan_by_shift = False
         self.cursor_mode = 'zoom'
         self.data_callback = data_callback
         self.cursor_callback = cursor_callback
@@ -92,7 +96,7 @@ class ImagePanel(BasePanel):
         conf.log_scale = False
         conf.show_axis = show_axis
         conf.highlight_areas = []
-        if 1 in data.shape:
+        if 1 in data.shape and hasattr(data, 'squeeze'):
             data = data.squeeze()
         self.data_range = [0, data.shape[1], 0, data.shape[0]]
         if contrast_level in (0, None):
@@ -102,12 +106,19 @@ class ImagePanel(BasePanel):
         if auto_contrast:
             conf.contrast_level = 0.10
 
+        # for out-of-core data, start with a decimated preview image
+        img, level = data, 0
+        if is_out_of_core(data):
+            while max(data.shape[:2]) > conf.preview_size*2**level:
+                level += 1
+            img = np.asarray(data[::2**level, ::2**level])
+
         if conf.contrast_level not in (0, None):
             clevel = float(conf.contrast_level)
-            imin, imax = np.percentile(data, [clevel, 100.0-clevel])
-            img = np.clip(data, imin, imax)
+            imin, imax = np.percentile(img, [clevel, 100.0-clevel])
+            img = np.clip(img, imin, imax)
         else:
-            img = data[:]
+            img = img[:]
 
         if store_data:
             conf.data = data
@@ -134,11 +145,15 @@ class ImagePanel(BasePanel):
                 levels  = np.linspace(img.min(), img.max(), nlevels+1)
             else:
                 self.conf.contour_levels = levels
+            ckws = {}
+            if level > 0:
+                ny, nx = img.shape[:2]
+                ckws['extent'] = (0, (nx-1)*2**level, 0, (ny-1)*2**level)
             self.conf.image = self.axes.contourf(img, cmap=self.conf.cmap[col],
-                                                 levels=levels)
+                                                 levels=levels, **ckws)
 
             self.conf.contour = self.axes.contour(img, cmap=self.conf.cmap[col],
-                                                  levels=levels)
+                                                  levels=levels, **ckws)
             cmap_name = self.conf.cmap[col].name
             xname = 'gray'
             try:
@@ -171,6 +186,9 @@ class ImagePanel(BasePanel):
                 self.conf.set_colormap(colormap, icol=col)
             self.conf.image = self.axes.imshow(img, cmap=self.conf.cmap[col],
                                                interpolation=self.conf.interp)
+            self.conf.image_levels = None
+            self.conf.set_image_window(None, img.shape, level=level)
+            self.build_pyramid()
 
         self.autoset_margins()
 
@@ -180,10 +198,29 @@ class ImagePanel(BasePanel):
         if hasattr(self.data_callback, '__call__'):
             self.data_callback(data, x=x, y=y, **kws)
 
-        self.conf.indices = None
-        self.indices_thread = Thread(target=self.calc_indices, args=(data.shape, ))
-        self.indices_thread.start()
 
+    def build_pyramid(self):
+        """build image pyramid for the current data in a thread, if the
+        image is large, and redraw when it is ready.  Out-of-core data
+        is read from decimated tiles instead."""
+        conf = self.conf
+        data = conf.data
+        if conf.pyramid is not None and conf.pyramid[0] is data:
+            return
+        conf.pyramid = None
+        if (data is None or conf.get_tiles() is not None or
+            data.shape[0]*data.shape[1] < conf.pyramid_minpixels):
+            return
+        def build():
+            pyramid = conf.make_pyramid(data)
+            wx.CallAfter(self.set_pyramid, pyramid)
+        Thread(target=build, daemon=True).start()
+
+    def set_pyramid(self, pyramid):
+        "use image pyramid from a thread started by build_pyramid()"
+        if pyramid[0] is self.conf.data:
+            self.conf.set_pyramid(pyramid)
+            self.redraw()
 
     def update_image(self, data):
         """
@@ -191,11 +228,24 @@ class ImagePanel(BasePanel):
         """
         if 1 in data.shape:
             data = data.squeeze()
-        if self.conf.contrast_level is not None:
-            clevel = float(self.conf.contrast_level)
+        conf = self.conf
+        image = getattr(conf, 'image', None)
+        window = None
+        if (self.axes.images[0] is image and conf.data is not None and
+            data.shape == conf.data.shape):
+            # process only the data around the current view
+            window = conf.get_data_window()
+            if window is not None:
+                y0, y1, x0, x1 = window
+                data = data[y0:y1, x0:x1]
+        if conf.contrast_level is not None:
+            clevel = float(conf.contrast_level)
             imin, imax = np.percentile(data, [clevel, 100.0-clevel])
             data = np.clip((data - imin)/(imax - imin + 1.e-8), 0, 1)
-        self.axes.images[0].set_data(data)
+        if self.axes.images[0] is image:
+            conf.set_image_data(data, window=window)
+        else:
+            self.axes.images[0].set_data(data)
         self.canvas.draw()
 
 
@@ -412,25 +462,8 @@ class ImagePanel(BasePanel):
     ####
     ## GUI events, overriding BasePanel components
     ####
-    def calc_indices(self, shape):
-        """calculates and stores the set of indices
-        ix=[0, nx-1], iy=[0, ny-1] for data of shape (nx, ny)"""
-        if len(shape) == 2:
-            ny, nx = shape
-        elif len(shape) == 3:
-            ny, nx, nchan = shape
-
-        inds = []
-        for iy in range(ny):
-            inds.extend([(ix, iy) for ix in range(nx)])
-        self.conf.indices = np.array(inds)
-
     def lassoHandler(self, vertices):
-        if self.conf.indices is None or self.indices_thread.is_alive():
-            self.indices_thread.join()
-        ind = self.conf.indices
-        mask = inside_poly(vertices,ind)
-        mask.shape = (self.conf.data.shape[0], self.conf.data.shape[1])
+        mask = polygon_mask(vertices, self.conf.data.shape)
         self.lasso = None
         self.canvas.draw()
         if hasattr(self.lasso_callback , '__call__'):
@@ -473,7 +506,7 @@ class ImagePanel(BasePanel):
             zlims[ax] = [xmin, xmax, ymin, ymax]
 
             if len(self.conf.zoom_lims) == 0:
-                self.conf.zoom_lims.append(zlims)
+                self.push_zoom_lims(zlims)
 
 
             ax_inv = ax.transData.inverted
@@ -488,7 +521,7 @@ class ImagePanel(BasePanel):
 
             tlims[ax] = [int(round(min(x0, x1))), int(round(max(x0, x1))),
                          int(round(min(y0, y1))), int(round(max(y0, y1)))]
-            self.conf.zoom_lims.append(tlims)
+            self.push_zoom_lims(tlims)
             # now apply limits:
             self.set_viewlimits()
             if callable(self.zoom_callback):
@@ -510,76 +543,8 @@ class ImagePanel(BasePanel):
         conf = self.conf
         img = conf.data
         if img is None: return
-        if len(img.shape) == 2:
-            col = 0
-        if self.conf.style == 'image':
-            if conf.log_scale:
-                img = np.log10(1 + 9.0*img)
-
-        # apply intensity scale for current limited (zoomed) image
-        if len(img.shape) == 2:
-            # apply clipped color scale, as from sliders
-
-            imin = float(conf.int_lo[col])
-            imax = float(conf.int_hi[col])
-            if conf.log_scale:
-                imin = np.log10(1 + 9.0*imin)
-                imax = np.log10(1 + 9.0*imax)
-
-            (xmin, xmax, ymin, ymax) = self.conf.datalimits
-            if xmin is None:  xmin = 0
-            if xmax is None:  xmax = img.shape[1]
-            if ymin is None:  ymin = 0
-            if ymax is None:  ymax = img.shape[0]
-
-
-            img = (img - imin)/(imax - imin + 1.e-8)
-            mlo = conf.cmap_lo[0]/(1.0*conf.cmap_range)
-            mhi = conf.cmap_hi[0]/(1.0*conf.cmap_range)
-            if self.conf.style == 'image':
-                conf.image.set_data(np.clip((img - mlo)/(mhi - mlo + 1.e-8), 0, 1))
-                conf.image.set_interpolation(conf.interp)
-        else:
-            r, g, b = img[:,:,0], img[:,:,1], img[:,:,2]
-
-            rmin = float(conf.int_lo[0])
-            rmax = float(conf.int_hi[0])
-            gmin = float(conf.int_lo[1])
-            gmax = float(conf.int_hi[1])
-            bmin = float(conf.int_lo[2])
-            bmax = float(conf.int_hi[2])
-            if conf.log_scale:
-                rmin = np.log10(1 + 9.0*rmin)
-                rmax = np.log10(1 + 9.0*rmax)
-                gmin = np.log10(1 + 9.0*gmin)
-                gmax = np.log10(1 + 9.0*gmax)
-                bmin = np.log10(1 + 9.0*bmin)
-                bmax = np.log10(1 + 9.0*bmax)
-
-            rlo = conf.cmap_lo[0]/(1.0*conf.cmap_range)
-            rhi = conf.cmap_hi[0]/(1.0*conf.cmap_range)
-            glo = conf.cmap_lo[1]/(1.0*conf.cmap_range)
-            ghi = conf.cmap_hi[1]/(1.0*conf.cmap_range)
-            blo = conf.cmap_lo[2]/(1.0*conf.cmap_range)
-            bhi = conf.cmap_hi[2]/(1.0*conf.cmap_range)
-            r = (r - rmin)/(rmax - rmin + 1.e-8)
-            g = (g - gmin)/(gmax - gmin + 1.e-8)
-            b = (b - bmin)/(bmax - bmin + 1.e-8)
-
-            inew = img*1.0
-            inew[:,:,0] = np.clip((r - rlo)/(rhi - rlo + 1.e-8), 0, 1)
-            inew[:,:,1] = np.clip((g - glo)/(ghi - glo + 1.e-8), 0, 1)
-            inew[:,:,2] = np.clip((b - blo)/(bhi - blo + 1.e-8), 0, 1)
-
-            whitebg = conf.tricolor_bg.startswith('wh')
-
-            if whitebg:
-                inew = conf.tricolor_white_bg(inew)
-
-            if self.conf.style == 'image':
-                conf.image.set_data(inew)
-                conf.image.set_interpolation(conf.interp)
-
+        if conf.style == 'image':
+            conf.show_data()
 
         try:
             self.scalebar_rect.remove()
@@ -618,7 +583,7 @@ class ImagePanel(BasePanel):
 
 
     def report_motion(self, event=None):
-        if event.inaxes is None:
+        if event.inaxes is None or self.skip_motion(event):
             return
         fmt = "X,Y= %g, %g"
         x, y  = event.xdata, event.ydata
@@ -632,7 +597,9 @@ class ImagePanel(BasePanel):
                 self.motion_sbar = self.nstatusbar-1
             except AttributeError:
                 self.motion_sbar = 1
-        self.write_message(fmt % (x, y), panel=self.motion_sbar)
+        self.write_motion_message(fmt % (x, y), panel=self.motion_sbar)
+        if callable(self.motion_callback):
+            self.motion_callback(wid=self.GetId(), x=x, y=y)
         conf = self.conf
         if conf.slice_onmotion:
             ix, iy = int(round(x)), int(round(y))
@@ -753,11 +720,11 @@ class ImagePanel(BasePanel):
             pf.panel.set_title(popts['title'], delay_draw=True)
             pf.panel.set_xlabel(popts['xlabel'], delay_draw=True)
             if len(_y.shape) == 2 and _y.shape[1] == 3:
-                pf.update_line(0, _x,  _y[:, 0], update_limits=True, draw=False)
-                pf.update_line(1, _x,  _y[:, 1], update_limits=True, draw=False)
-                pf.update_line(2, _x,  _y[:, 2], update_limits=True, draw=True)
+                pf.update_line(0, _x,  _y[:, 0], update_limits=True, draw=False, blit=True)
+                pf.update_line(1, _x,  _y[:, 1], update_limits=True, draw=False, blit=True)
+                pf.update_line(2, _x,  _y[:, 2], update_limits=True, draw=True, blit=True)
             else:
-                pf.update_line(0, _x, _y, update_limits=True, draw=True)
+                pf.update_line(0, _x, _y, update_limits=True, draw=True, blit=True)
 
 
         pf.Show()
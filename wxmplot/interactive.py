@@ -254,7 +254,8 @@ class PlotDisplay(PlotFrame):
             for itrace, trace in enumerate(traces):
                 x, y = trace
                 if len(x) >  1 and len(x) == len(y):
-                    self.update_line(itrace, x, y, draw=(itrace==(ntraces-1)))
+                    self.update_line(itrace, x, y, draw=(itrace==(ntraces-1)),
+                                     blit=True)
 
     def onExit(self, o, **kw):
         if self.window in PLOT_DISPLAYS:
@@ -4,7 +4,6 @@
 
 from functools import partial
 import yaml
-import numpy as np
 import wx
 import wx.lib.colourselect  as csel
 import wx.lib.scrolledpanel as scrolled
@@ -171,6 +170,8 @@ class PlotConfigFrame(wx.Frame):
         # choices
         for attr in ('theme', 'legend_loc', 'legend_onaxis', 'zoom_style'):
             self.wids[attr].SetStringSelection(confdict[attr])
+        if 'errorbar_style' in confdict:
+            self.wids['errorbar_style'].SetStringSelection(confdict['errorbar_style'])
 
         xscale = confdict['xscale']
         yscale = confdict['yscale']
@@ -237,6 +238,17 @@ class PlotConfigFrame(wx.Frame):
         sizer.Add(ztitle,      (2, 0), (1,1), labstyle, 2)
         sizer.Add(zoomchoice,  (2, 1), (1,3), labstyle, 2)
 
+        # Error bars
+        etitle = wx.StaticText(panel, -1, 'Error Bars: ')
+        errchoice = wx.Choice(panel, choices=self.conf.errorbar_choices,
+                              size=(200,-1))
+        self.wids['errorbar_style'] = errchoice
+        if self.conf.errorbar_style in self.conf.errorbar_choices:
+            errchoice.SetStringSelection(self.conf.errorbar_style)
+        errchoice.Bind(wx.EVT_CHOICE, self.onErrorbarStyle)
+        sizer.Add(etitle,     (2, 4), (1,1), labstyle, 2)
+        sizer.Add(errchoice,  (2, 5), (1,3), labstyle, 2)
+
         # Bounds
         axes = self.canvas.figure.get_axes()
         laxes = axes[0]
@@ -825,10 +837,9 @@ class PlotConfigFrame(wx.Frame):
             color = hexcolor(event_col)
 
         if item == 'trace':
-            self.conf.set_trace_color(color, trace=trace)
+            self.conf.apply_trace_style(trace, color=color,
+                                        delay_draw=not self.conf.show_legend)
             self.wids[f'trace_{trace}']['color'].SetColour(color)
-            if self.conf.show_legend:
-                self.conf.draw_legend()
 
         elif item == 'grid':
             self.conf.set_gridcolor(color)
@@ -862,7 +873,7 @@ class PlotConfigFrame(wx.Frame):
                 newcol = hexcolor(lin.color)
                 self.wids[f'trace_{i}']['color'].SetColour(newcol)
                 if newcol != curcol:
-                    self.conf.set_trace_color(newcol, trace=i)
+                    self.conf.apply_trace_style(i, color=newcol, delay_draw=True)
             except KeyError:
                 pass
         conf.draw_legend()
@@ -878,43 +889,48 @@ class PlotConfigFrame(wx.Frame):
     def onZoomStyle(self, event=None):
         self.conf.zoom_style = event.GetString()
 
+    def onErrorbarStyle(self, event=None):
+        self.conf.set_errorbar_style(event.GetString())
+
     def onStyle(self, event, trace=0):
-        self.conf.set_trace_style(event.GetString(),trace=trace)
+        self.conf.apply_trace_style(trace, style=event.GetString())
 
     def onJoinStyle(self, event, trace=0):
-        self.conf.set_trace_drawstyle(event.GetString(), trace=trace)
+        self.conf.apply_trace_style(trace, drawstyle=event.GetString())
 
     def onFill(self, event, trace=0):
-        self.conf.set_trace_fill(event.IsChecked(), trace=trace)
+        self.conf.apply_trace_style(trace, fill=event.IsChecked())
 
     def onSymbol(self, event, trace=0):
-        self.conf.set_trace_marker(event.GetString(), trace=trace)
+        self.conf.apply_trace_style(trace, marker=event.GetString())
 
     def onMarkerSize(self, event, trace=0):
         val = event.GetEventObject().GetValue()
         if trace == -1:
             for t, c in enumerate(self.choice_markersizes):
                 c.SetValue(val)
-                self.conf.set_trace_markersize(val, trace=t)
+                self.conf.apply_trace_style(t, markersize=val, delay_draw=True)
+            self.conf.draw_legend()
         else:
-            self.conf.set_trace_markersize(val, trace=trace)
+            self.conf.apply_trace_style(trace, markersize=val)
 
     def onAlpha(self, event, trace=0):
-        self.conf.set_trace_alpha(event.GetEventObject().GetValue(), trace=trace,
-                                  delay_draw=False)
+        self.conf.apply_trace_style(trace, alpha=event.GetEventObject().GetValue())
 
     def onZorder(self, event, trace=0):
-        self.conf.set_trace_zorder(event.GetEventObject().GetValue(),
-                                   trace=trace)
+        self.conf.apply_trace_style(trace, zorder=event.GetEventObject().GetValue(),
+                                    delay_draw=True)
+        self.canvas.draw()
 
     def onThickness(self, event, trace=0):
         val = event.GetEventObject().GetValue()
         if trace == -1:
             for t, c in enumerate(self.choice_linewidths):
                 c.SetValue(val)
-                self.conf.set_trace_linewidth(val, trace=t)
+                self.conf.apply_trace_style(t, linewidth=val, delay_draw=True)
+            self.conf.draw_legend()
         else:
-            self.conf.set_trace_linewidth(val, trace=trace)
+            self.conf.apply_trace_style(trace, linewidth=val)
 
 
     def onAutoBounds(self, event):
@@ -1019,7 +1035,6 @@ class PlotConfigFrame(wx.Frame):
 
     def onScatter(self, event, item=None):
         conf = self.conf
-        axes = self.canvas.figure.get_axes()[0]
         if item == 'size':
             conf.scatter_size = event.GetInt()
         elif item == 'scatt_nf':
@@ -1031,22 +1046,9 @@ class PlotConfigFrame(wx.Frame):
         elif item == 'scatt_se':
             self.conf.scatter_selectedge = hexcolor(event.GetValue())
 
-        axes.cla()
-        xd, yd = conf.scatter_xdata, conf.scatter_ydata
-        mask = conf.scatter_mask
-        if mask is  None:
-            axes.scatter(xd, yd, s=conf.scatter_size,
-                         c=conf.scatter_normalcolor,
-                         edgecolors=conf.scatter_normaledge)
-        else:
-            axes.scatter(xd[np.where(~mask)], yd[np.where(~mask)],
-                         s=conf.scatter_size,
-                         c=conf.scatter_normalcolor,
-                         edgecolors=conf.scatter_normaledge)
-            axes.scatter(xd[np.where(mask)], yd[np.where(mask)],
-                         s=conf.scatter_size,
-                         c=conf.scatter_selectcolor,
-                         edgecolors=conf.scatter_selectedge)
+        if conf.scatter_collection is not None:
+            conf.scatter_collection.set_sizes([conf.scatter_size])
+            conf.set_scatter_selection(conf.scatter_mask, recolor=True)
         self.conf.relabel(delay_draw=False)
 
     def onText(self, event=None, item='trace', trace=0):
@@ -1103,7 +1105,7 @@ class PlotConfigFrame(wx.Frame):
                 wid.SetForegroundColour(get_color('text_invalid'))
         elif item == 'trace':
             try:
-                self.conf.set_trace_label(s, trace=trace)
+                self.conf.apply_trace_style(trace, label=s)
             except:
                 pass
 
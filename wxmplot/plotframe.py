@@ -83,10 +83,18 @@ class PlotFrame(BaseFrame):
         "reset the plot configuration"
         self.panel.reset_config()
 
+    def set_decimate(self, decimate=True, **kws):
+        """set whether to use min/max decimation of traces for display"""
+        self.panel.set_decimate(decimate=decimate, **kws)
+
     def update_line(self, t, x, y, **kw):
         """overwrite data for trace t """
         self.panel.update_line(t, x, y, **kw)
 
+    def append_data(self, t, x, y, **kw):
+        """append data to trace t, as for a strip chart """
+        self.panel.append_data(t, x, y, **kw)
+
     def ExportTextFile(self, fname, title='unknown plot'):
         "save plot data to external file"
 
@@ -99,8 +107,7 @@ class PlotFrame(BaseFrame):
         for ax in self.panel.fig.get_axes():
             for line in ax.lines:
                 itrace += 1
-                x = line.get_xdata()
-                y = line.get_ydata()
+                x, y = self.panel.conf.get_line_data(line)
                 ylab = line.get_label()
 
                 if len(ylab) < 1:
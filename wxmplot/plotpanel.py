@@ -9,7 +9,8 @@ from copy import deepcopy
 import yaml
 import wx
 
-from numpy import nonzero, where, arange
+from numpy import (nonzero, arange, atleast_1d, ndarray, datetime64,
+                   asarray, column_stack, zeros, hypot)
 import matplotlib as mpl
 from matplotlib.dates import date2num, datestr2num, num2date
 from matplotlib.dates import AutoDateLocator
@@ -21,27 +22,23 @@ from matplotlib.gridspec import GridSpec
 from matplotlib.colors import colorConverter
 
 from wxutils import get_cwd, DARK_THEME, register_darkdetect
-from .basepanel import BasePanel
+from .basepanel import (BasePanel, cursor_date_format, datetime64_to_num,
+                        epoch_to_num)
 from .config import PlotConfig, ifnot_none, SIDE_YAXES
-from .utils import inside_poly, MenuItem, fix_filename
+from .ringbuffer import RingBuffer
+from .spatialindex import make_index
+from .utils import inside_poly, MenuItem, fix_filename, DrawScheduler
 from .plotconfigframe import PlotConfigFrame
 
 to_rgba = colorConverter.to_rgba
 
+# oplot() options that plot_many() can apply with add_trace()
+BATCH_TRACE_OPTS = ('label', 'color', 'style', 'linewidth', 'marker',
+                    'markersize', 'drawstyle', 'alpha', 'zorder', 'dy',
+                    'fill', 'yaxes', 'side', 'delay_draw')
+
 def format_date(x, xrange, tz=None):
-    if xrange > 12: # 12 days
-        dtformat = "%Y-%m-%d"
-    elif xrange > 3: # 3 days
-        dtformat = "%Y-%m-%d %H"
-    elif xrange > 0.25: # 6 hours
-        dtformat = "%m-%d %H:%M"
-    elif xrange > 0.12: #
-        dtformat = "%d %H:%M:%S"
-    elif xrange > 0.01: # 4.4 seconds
-        dtformat = "%H:%M:%S.%f"
-    else:
-        dtformat = "%M:%S.%f"
-    return datetime.strftime(num2date(x, tz=tz), dtformat)
+    return datetime.strftime(num2date(x, tz=tz), cursor_date_format(xrange))
 
 
 class PlotPanel(BasePanel):
@@ -58,9 +55,11 @@ class PlotPanel(BasePanel):
     def __init__(self, parent, size=(700, 450), dpi=150, axisbg=None,
                  facecolor=None, fontsize=9, trace_color_callback=None,
                  output_title='plot', with_data_process=True, theme='auto',
-                 **kws):
+                 coalesce_draws=True, snap_cursor=False, **kws):
 
         self.trace_color_callback = trace_color_callback
+        self.coalesce_draws = coalesce_draws
+        self.snap_cursor = snap_cursor
         BasePanel.__init__(self, parent,
                            output_title=output_title, size=size, **kws)
 
@@ -87,6 +86,10 @@ class PlotPanel(BasePanel):
         self.conf.axes_traces = {}
         self.use_dates = False
         self.dates_style = None
+        self.blit_lines = set()
+        self.blit_background = None
+        self.blit_signature = None
+        self.blit_captured = set()
         register_darkdetect(self.onDarkMode)
 
     def onDarkMode(self, is_dark=None):
@@ -150,7 +153,7 @@ class PlotPanel(BasePanel):
               labelfontsize=None, titlefontsize=None, legendfontsize=None,
               fullbox=None, axes_style=None, zorder=None, viewpad=None,
               theme=None, use_dates=None, dates_style=None, timezone=None,
-              yaxes=1, side=None, yaxes_tracecolor=None, **kws):
+              yaxes=1, side=None, yaxes_tracecolor=None, decimate=None, **kws):
 
         """
         basic plot method, adding to an existing display
@@ -185,24 +188,33 @@ class PlotPanel(BasePanel):
         self.dates_style = ifnot_none(dates_style, self.dates_style)
         self.use_dates = ifnot_none(use_dates, self.use_dates)
 
-        if isinstance(xdata[0], datetime):
+        is_dt64 = (isinstance(xdata, ndarray) and xdata.dtype.kind == 'M')
+        if is_dt64 or isinstance(xdata[0], (datetime, datetime64)):
             self.use_dates = True
 
         if self.use_dates:
             # date handling options to get xdate to mpl dates
             #   1. xdate are in datetime: convert to mpl dates
-            #   2. xdata are strings: parse with datestr2num
-            #   3. xdata are floats: convert as unix timestamp to mpl dates
+            #   2. xdata are numpy datetime64: convert with numpy arithmetic
+            #   3. xdata are strings: parse with datestr2num
+            #   4. xdata are floats and dates_style is 'epoch':
+            #      convert as unix timestamp to mpl dates
             axes.xaxis.set_major_locator(AutoDateLocator())
             x0 = xdata[0]
             dstyle = self.dates_style
             if dstyle is None:
                 dstyle = ''
-            if isinstance(x0, datetime):
+            if is_dt64 or isinstance(x0, datetime64):
+                # datetime64 values have no zone, as for naive datetimes
+                self.dates_tzinfo = None
+                xdata = datetime64_to_num(xdata)
+            elif isinstance(x0, datetime):
                 self.dates_tzinfo = xdata[0].tzinfo
                 xdata = date2num(xdata)
             elif isinstance(x0, str) or dstyle.lower().startswith('str'):
                 xdata = datestr2num(xdata)
+            elif dstyle.lower() in ('epoch', 'unix', 'timestamp'):
+                xdata = epoch_to_num(xdata)
             if timezone is not None:
                 self.dates_tzinfo = timezone
         if linewidth is None:
@@ -212,6 +224,7 @@ class PlotPanel(BasePanel):
                 linewidth = 2.0
 
         conf.viewpad = ifnot_none(viewpad, conf.viewpad)
+        conf.decimate = ifnot_none(decimate, conf.decimate)
 
         if xlabel is not None:
             self.set_xlabel(xlabel, delay_draw=True)
@@ -263,23 +276,6 @@ class PlotPanel(BasePanel):
         if framecolor is not None:
             conf.set_framecolor(framecolor)
 
-        conf.set_trace_zorder(zorder, delay_draw=True)
-        conf.set_trace_yaxes(yaxes, delay_draw=True)
-        if color:
-            conf.set_trace_color(color, delay_draw=True)
-        if style:
-            conf.set_trace_style(style, delay_draw=True)
-        if marker:
-            conf.set_trace_marker(marker, delay_draw=True)
-        if linewidth is not None:
-            conf.set_trace_linewidth(linewidth, delay_draw=True)
-        if markersize is not None:
-            conf.set_trace_markersize(markersize, delay_draw=True)
-        if drawstyle is not None:
-            conf.set_trace_drawstyle(drawstyle, delay_draw=True)
-        if alpha is not None:
-            conf.set_trace_alpha(alpha, delay_draw=True)
-
         conf.dy[conf.ntrace] = dy
         if fill:
             fkws = dict(step=None, zorder=zorder, color=color)
@@ -292,17 +288,14 @@ class PlotPanel(BasePanel):
                 _fill = axes.fill_between(xdata, ydata-dy, y2=ydata+dy, **fkws)
         else: # not filling -- most plots here
             _fill = None
-            if dy is not None:
-                ebar = axes.errorbar(xdata, ydata, yerr=dy, zorder=zorder)
-                _lines = [ebar.lines[0], ebar.lines[2]]
-            else:
-                _lines = axes.plot(xdata, ydata, drawstyle=drawstyle, zorder=zorder)
+            _lines = axes.plot(xdata, ydata, drawstyle=drawstyle, zorder=zorder)
 
         conf.traces[conf.ntrace].fill = fill
 
         if axes not in conf.data_save:
             conf.data_save[axes] = []
         conf.data_save[axes].append((xdata, ydata))
+        conf.set_line_data(_lines[0], xdata, ydata)
 
         if conf.show_grid and axes == self.axes:
             # I'm sure there's a better way...
@@ -329,7 +322,11 @@ class PlotPanel(BasePanel):
 
         if label is None:
             label = 'trace %i' % (conf.ntrace+1)
-        conf.set_trace_label(label, delay_draw=True)
+        conf.apply_trace_style(conf.ntrace, delay_draw=True, label=label,
+                               zorder=zorder, yaxes=yaxes, color=color or None,
+                               style=style or None, marker=marker or None,
+                               linewidth=linewidth, markersize=markersize,
+                               drawstyle=drawstyle, alpha=alpha)
         needs_relabel = False
         if labelfontsize is not None:
             conf.labelfont.set_size(labelfontsize)
@@ -350,15 +347,25 @@ class PlotPanel(BasePanel):
             conf.lines.append(_lines)
             conf.fills.append(_fill)
 
-        # now set plot limits:
+        # now set plot limits, for only this axes unless the
+        # padding or scales (which apply to all axes) were given
+        conf.set_axes_dirty(axes)
         if not delay_draw:
-            self.set_viewlimits()
+            self.set_viewlimits(dirty_only=(viewpad is None and
+                                            xlog_scale is None and
+                                            ylog_scale is None and
+                                            y2log_scale is None and
+                                            y3log_scale is None and
+                                            y4log_scale is None))
+        if dy is not None:
+            conf.draw_errorbars(conf.ntrace)
 
         if refresh:
             conf.refresh_trace(conf.ntrace)
             needs_relabel = True
         if conf.show_legend:
-            conf.draw_legend(delay_draw=True)
+            # the legend is rebuilt once, at the next draw
+            conf.legend_dirty = True
 
         if needs_relabel:
             conf.relabel(delay_draw=True)
@@ -416,8 +423,13 @@ class PlotPanel(BasePanel):
         self.plot(x0, y0, **opts)
         for dat in datalist[1:]:
             x, y, opts = unpack_tracedata(dat, delay_draw=True)
-            self.oplot(x, y, **opts)
+            if self.can_batch_trace(opts):
+                self.add_trace(x, y, **opts)
+            else:
+                self.oplot(x, y, **opts)
 
+        conf.set_yaxes_tracecolor(delay_draw=True)
+        self.set_viewlimits()
         self.set_zoomlimits(zoom_limits)
         self.conf.show_legend = show_legend
         if show_legend:
@@ -425,6 +437,68 @@ class PlotPanel(BasePanel):
         conf.relabel(delay_draw=True)
         self.reset_formats()
         self.draw()
+
+    def can_batch_trace(self, opts):
+        """whether a trace with oplot() options opts can be added with
+        add_trace(): only trace properties can be given, and the trace
+        must go on a y axes that already has traces."""
+        if self.use_dates or not set(opts.keys()).issubset(BATCH_TRACE_OPTS):
+            return False
+        if opts.get('fill', False):
+            return False
+        yaxes = opts.get('yaxes', 1)
+        if opts.get('side', None) is not None:
+            yaxes = SIDE_YAXES.get(opts['side'], yaxes)
+        allaxes = self.fig.get_axes()
+        return (yaxes in (1, 2, 3, 4) and yaxes <= len(allaxes) and
+                allaxes[yaxes-1] in self.conf.axes_traces)
+
+    def add_trace(self, xdata, ydata, label=None, color=None, style=None,
+                  linewidth=None, marker=None, markersize=None,
+                  drawstyle=None, alpha=None, zorder=None, dy=None,
+                  fill=False, yaxes=1, side=None, delay_draw=True):
+        """add a trace to a plot set up with plot(), for plot_many()
+
+        This sets only the properties of the trace itself, and does not
+        set view limits, redraw the legend, or draw the plot.
+        """
+        conf = self.conf
+        yaxes, axes = self.get_yaxes(yaxes, side=side)
+        trace = conf.ntrace
+        if trace >= len(conf.traces):
+            conf.init_trace(trace, 'black', 'solid')
+        while len(conf.lines) <= trace:
+            conf.lines.append(None)
+        while len(conf.fills) <= trace:
+            conf.fills.append(None)
+        while len(conf.dy) <= trace:
+            conf.dy.append(None)
+
+        zorder = ifnot_none(zorder, 5*(trace+1))
+        conf.axes_traces[axes].append(trace)
+        _lines = axes.plot(xdata, ydata, zorder=zorder)
+        conf.lines[trace] = _lines
+        conf.fills[trace] = None
+        conf.dy[trace] = dy
+        conf.data_save[axes].append((xdata, ydata))
+        conf.set_line_data(_lines[0], xdata, ydata)
+
+        prop = conf.traces[trace]
+        prop.label = ifnot_none(label, 'trace %i' % (trace+1))
+        prop.zorder = zorder
+        prop.yaxes = yaxes
+        prop.fill = False
+        for attr, val in (('color', color), ('style', style),
+                          ('linewidth', linewidth), ('marker', marker),
+                          ('markersize', markersize),
+                          ('drawstyle', drawstyle), ('alpha', alpha)):
+            if val is not None:
+                setattr(prop, attr, val)
+        conf.refresh_trace(trace)
+        if dy is not None:
+            conf.draw_errorbars(trace)
+        conf.ntrace = trace + 1
+        return _lines
         # self.canvas.Refresh()
 
     def hist(self, x, bins=None, density=None, cumulative=None,
@@ -655,10 +729,19 @@ class PlotPanel(BasePanel):
         # self.conf.set_trace_datarange((min(xdata), max(xdata),
         #                                min(ydata), max(ydata)))
 
+        xdata, ydata = asarray(xdata), asarray(ydata)
         self.conf.scatter_xdata = xdata
         self.conf.scatter_ydata = ydata
-        self.axes.scatter(xdata, ydata, c=self.conf.scatter_normalcolor,
-                          edgecolors=self.conf.scatter_normaledge)
+        self.conf.scatter_points = column_stack((xdata, ydata))
+        self.conf.scatter_index = None
+        self.conf.scatter_mask = None
+        self.conf.scatter_shown = None
+        coll = self.conf.scatter_collection
+        if coll is not None and coll in axes.collections:
+            coll.remove()
+        self.conf.scatter_collection = axes.scatter(xdata, ydata,
+                                      c=self.conf.scatter_normalcolor,
+                                      edgecolors=self.conf.scatter_normaledge)
 
         if self.conf.show_grid:
             for i in axes.get_xgridlines()+axes.get_ygridlines():
@@ -684,30 +767,19 @@ class PlotPanel(BasePanel):
         conf = self.conf
         if self.conf.plot_type == 'scatter':
             xd, yd = conf.scatter_xdata, conf.scatter_ydata
-            sdat = list(zip(xd, yd))
-            oldmask = conf.scatter_mask
-            try:
-                self.axes.scatter(xd[where(oldmask)], yd[where(oldmask)],
-                                  s=conf.scatter_size,
-                                  c=conf.scatter_normalcolor,
-                                  edgecolors=conf.scatter_normaledge)
-            except IndexError:
-                self.axes.scatter(xd, yd, s=conf.scatter_size,
-                                  c=conf.scatter_normalcolor,
-                                  edgecolors=conf.scatter_normaledge)
-
-            mask = conf.scatter_mask = inside_poly(vertices, sdat)
+            sdat = conf.scatter_points
+            if conf.scatter_index is None:
+                conf.scatter_index = make_index(xd, yd)
+            mask = self.lasso_mask(vertices, sdat, conf.scatter_index)
+            conf.scatter_mask = mask
             pts = nonzero(mask)[0]
-            self.axes.scatter(xd[where(mask)], yd[where(mask)],
-                              s=conf.scatter_size,
-                              c=conf.scatter_selectcolor,
-                              edgecolors=conf.scatter_selectedge)
+            conf.set_scatter_selection(mask)
 
         else:
-            xdata = self.axes.lines[0].get_xdata()
-            ydata = self.axes.lines[0].get_ydata()
-            sdat = [(x, y) for x, y in zip(xdata, ydata)]
-            mask = inside_poly(vertices,sdat)
+            line = self.axes.lines[0]
+            xdata, ydata = conf.get_line_data(line)
+            sdat = column_stack((xdata, ydata))
+            mask = self.lasso_mask(vertices, sdat, conf.get_line_index(line))
             pts = nonzero(mask)[0]
 
         self.lasso = None
@@ -718,6 +790,46 @@ class PlotPanel(BasePanel):
             self.lasso_callback(data = sdat,
                                 selected=pts, mask=mask)
 
+    def lasso_mask(self, vertices, sdat, index):
+        """mask of points in sdat (array of x, y pairs) inside the
+        lasso vertices, testing only points inside the bounding box of the
+        vertices, as found with the spatial index for the data"""
+        verts = asarray(vertices)
+        mask = zeros(len(sdat), dtype=bool)
+        cand = index.query_box(verts[:, 0].min(), verts[:, 0].max(),
+                               verts[:, 1].min(), verts[:, 1].max())
+        if len(cand) > 0:
+            mask[cand] = inside_poly(vertices, sdat[cand])
+        return mask
+
+    def get_nearest_point(self, x, y, axes=None):
+        """get data point of the traces on an axes nearest to x, y (in
+        user coordinates), with distances scaled by the axes view ranges.
+
+        Returns:
+            (line, index, xval, yval) for the nearest point, or None
+        """
+        if axes is None:
+            axes = self.axes
+        conf = self.conf
+        xlims, ylims = axes.get_xlim(), axes.get_ylim()
+        xscale = max(abs(xlims[1] - xlims[0]), 1.e-14)
+        yscale = max(abs(ylims[1] - ylims[0]), 1.e-14)
+        best, best_dist = None, None
+        for line in axes.get_lines():
+            if line not in conf.fullres_data or not line.get_visible():
+                continue
+            index = conf.get_line_index(line).nearest(x, y, xscale=xscale,
+                                                      yscale=yscale)
+            if index is None:
+                continue
+            xdata, ydata = conf.get_line_data(line)
+            xval, yval = xdata[index], ydata[index]
+            dist = hypot((xval-x)/xscale, (yval-y)/yscale)
+            if best is None or dist < best_dist:
+                best, best_dist = (line, index, xval, yval), dist
+        return best
+
     def set_xylims(self, limits, axes=None, yaxes=1, side=None):
         "set user-defined limits and apply them"
         if axes is None:
@@ -726,13 +838,14 @@ class PlotPanel(BasePanel):
         self.conf.user_limits[axes] = list(limits)
         self.unzoom_all()
 
-    def set_viewlimits(self):
+    def set_viewlimits(self, dirty_only=False):
         """updates xy limits of a plot based on current data,
         user defined limits, and any zoom level
 
+        with dirty_only=True, only axes with changed data are updated
         """
         self.reset_formats()
-        self.conf.set_viewlimits()
+        self.conf.set_viewlimits(dirty_only=dirty_only)
 
     def get_viewlimits(self, axes=None):
         if axes is None:
@@ -785,6 +898,11 @@ class PlotPanel(BasePanel):
         self.conf.y4label = ''
         self.conf.title  = ''
         self.conf.data_save = {}
+        self.conf.reset_line_data()
+        self.conf.scroll_xlims = None
+        self.conf.axes_datarange = {}
+        self.blit_lines = set()
+        self.blit_background = None
 
     def reset_config(self):
         """reset configuration to defaults."""
@@ -837,6 +955,15 @@ class PlotPanel(BasePanel):
                                y4scale=y4scale,
                                delay_draw=delay_draw)
 
+    def set_decimate(self, decimate=True, delay_draw=False):
+        """set whether to display traces with min/max decimation, so that
+        traces with many more points than the plot has pixels draw quickly.
+        Full-resolution data is kept, and decimation is redone on zooming.
+        """
+        self.conf.set_decimate(decimate)
+        if not delay_draw:
+            self.draw()
+
     def toggle_legend(self, evt=None, show=None):
         "toggle legend display"
         if show is None:
@@ -939,9 +1066,17 @@ class PlotPanel(BasePanel):
 
         canvas_draw = self.canvas.draw
         def draw(*args, **kws):
+            self.blit_background = None
+            self.pan_background = None
+            if self.conf.legend_dirty:
+                self.conf.draw_legend(delay_draw=True)
             self.autoset_margins()
             canvas_draw(*args, **kws)
-        self.canvas.draw = draw
+        # all requests to draw the canvas are coalesced, use
+        # canvas.draw_now() to render immediately
+        self.draw_scheduler = DrawScheduler(draw, enabled=self.coalesce_draws)
+        self.canvas.draw = self.draw_scheduler.request
+        self.canvas.draw_now = self.draw_scheduler.draw_now
         self.addCanvasEvents()
 
     def BuildPopup(self):
@@ -1023,16 +1158,136 @@ class PlotPanel(BasePanel):
     def draw(self):
         self.canvas.draw()
 
+    def get_draw_stats(self, reset=False):
+        """get dict of counts of requested and performed draws of the
+        canvas, and the time spent drawing, optionally resetting these"""
+        stats = self.draw_scheduler.get_stats()
+        if reset:
+            self.draw_scheduler.reset_stats()
+        return stats
+
     def update_line(self, trace, xdata, ydata,draw=False,
-                    update_limits=True, yaxes=1, side=None):
-        """ update a single trace, for faster redraw """
+                    update_limits=True, yaxes=1, side=None, blit=False):
+        """ update a single trace, for faster redraw
+
+        with blit=True, the trace is redrawn with blit_draw(), redrawing
+        only the updated traces over a cached image of the rest of the plot.
+        """
         x = self.conf.get_mpl_line(trace)
         if trace >= self.conf.ntrace:
             self.oplot(xdata, ydata, yaxes=yaxes, side=side, delay_draw=True)
-        x.set_data(xdata, ydata)
+        self.conf.ringbuffers.pop(trace, None)
+        self.conf.scroll_xlims = None
+        self.conf.set_line_data(x, xdata, ydata)
+        if x.axes is not None:
+            self.conf.set_axes_dirty(x.axes)
+        if blit:
+            self.blit_lines.add(x)
+
+        if update_limits:
+            self.set_viewlimits(dirty_only=True)
+        if draw:
+            if blit:
+                self.blit_draw()
+            else:
+                self.draw()
+
+    def get_blit_signature(self):
+        """values that must be unchanged for a cached background image
+        of the plot to be reused: canvas size, axes positions, limits,
+        and labels, and legend text"""
+        sig = [tuple(self.canvas.get_width_height())]
+        for ax in self.fig.get_axes():
+            sig.append((tuple(ax.get_xlim()), tuple(ax.get_ylim()),
+                        tuple(ax.bbox.bounds), ax.get_title(),
+                        ax.get_xlabel(), ax.get_ylabel()))
+        lgn = self.conf.mpl_legend
+        if lgn is not None:
+            sig.append((lgn.get_visible(),
+                        tuple(t.get_text() for t in lgn.get_texts())))
+        return tuple(sig)
+
+    def blit_draw(self):
+        """fast redraw of traces updated with update_line(blit=True)
+
+        The rest of the plot (axes, ticks, grid, legend, other traces) is
+        rendered once without the updated traces and cached.  The updated
+        traces are then drawn over that cached background.  A full draw
+        is done when the canvas size, axes limits, or legend have changed,
+        or when any other full draw of the canvas has been done.
+        """
+        lines = self.blit_lines
+        if (self.blit_background is None or lines != self.blit_captured or
+            self.get_blit_signature() != self.blit_signature):
+            for line in lines:
+                line.set_animated(True)
+            try:
+                self.canvas.draw_now()
+            finally:
+                for line in lines:
+                    line.set_animated(False)
+            self.blit_background = self.canvas.copy_from_bbox(self.fig.bbox)
+            self.blit_signature = self.get_blit_signature()
+            self.blit_captured = set(lines)
+        else:
+            self.canvas.restore_region(self.blit_background)
+
+        for line in sorted(lines, key=lambda l: l.get_zorder()):
+            if line.axes is not None:
+                line.axes.draw_artist(line)
+        self.canvas.blit(self.fig.bbox)
+
+    def append_data(self, trace, xnew, ynew, maxlen=None, xwindow=None,
+                    update_limits=True, draw=True, yaxes=1, side=None):
+        """append one or more points to a trace, for fast updates of
+        streaming data such as strip charts.
 
+        Args:
+           trace (int):    index of trace (0 is the first trace)
+           xnew (float or array): new x value(s)
+           ynew (float or array): new y value(s)
+           maxlen (int or None):  maximum number of points to keep for trace
+           xwindow (float or None): width of scrolling x range to display,
+                                    ending at the most recent x value.
+                                    This does not change the user limits.
+           update_limits (bool): whether to update the plot limits [True]
+           draw (bool):    whether to redraw the canvas [True]
+           yaxes (int):    which y axis to use for a new trace [1]
+           side (str or None): which y axis to use for a new trace
+
+        Notes:
+           The most recent maxlen points of each trace are kept in a
+           RingBuffer, preallocated on the first call, and the data range
+           of the trace is updated incrementally.  maxlen defaults to
+           10000, or to the number of points the trace has when a
+           buffer is first created for it.
+        """
+        conf = self.conf
+        if trace >= conf.ntrace:
+            self.oplot(atleast_1d(xnew), atleast_1d(ynew), yaxes=yaxes,
+                       side=side, delay_draw=True)
+            xnew, ynew = [], []
+        buff = conf.ringbuffers.get(trace, None)
+        if buff is None or (maxlen is not None and maxlen != buff.maxlen):
+            xdat, ydat = conf.get_line_data(conf.get_mpl_line(trace))
+            if maxlen is None:
+                maxlen = max(10000, len(xdat))
+            buff = conf.ringbuffers[trace] = RingBuffer(maxlen, xdat, ydat)
+
+        buff.append(xnew, ynew)
+        line = conf.get_mpl_line(trace)
+        conf.set_line_data(line, buff.xdata, buff.ydata, stats=buff.stats())
+        if line.axes is not None:
+            conf.set_axes_dirty(line.axes)
+
+        # the scrolling x range is kept apart from the user limits, and
+        # is dropped when appending without xwindow
+        conf.scroll_xlims = None
+        if xwindow is not None and len(buff) > 0:
+            xmax = buff.xdata[-1]
+            conf.scroll_xlims = [xmax - xwindow, xmax]
         if update_limits:
-            self.set_viewlimits()
+            self.set_viewlimits(dirty_only=True)
         if draw:
             self.draw()
 
@@ -1075,11 +1330,13 @@ class PlotPanel(BasePanel):
             x, y = event.xdata, event.ydata
 
         ax  = self.canvas.figure.get_axes()[0]
+        if x is not None and y is not None and self.snap_cursor:
+            near = self.get_nearest_point(x, y)
+            if near is not None:
+                x, y = near[2], near[3]
         if x is not None and y is not None:
             if self.use_dates:
-                xlims = ax.get_xlim()
-                xrange = abs(xlims[1] - xlims[0])
-                x = format_date(x, xrange, tz=self.dates_tzinfo)
+                x = self.format_xdate(x)
             else:
                 x = f"{x:g}"
             msg = f"X,Y= {x}, {y:g}"
@@ -1103,20 +1360,16 @@ class PlotPanel(BasePanel):
                 ylims = ax.get_ylim()
                 xrange = max(xlims[1] - xlims[0], 1.e-14)
                 yrange = max(ylims[1] - ylims[0], 1.e-14)
-                for mx, my, label, extra in self.conf.marker_report_data:
-                    nearx, neary = True, True
-                    if mx is not None:
-                        nearx = (abs(event.xdata-mx) /xrange)  < 0.01
-                    if my is not None:
-                        neary = (abs(event.ydata-my) /yrange)  < 0.01
-                    if nearx and neary:
-                        marker_data.append((mx, my, label, extra))
+                marker_data = self.conf.get_markers_near(event.xdata,
+                                                         event.ydata,
+                                                         0.01*xrange,
+                                                         0.01*yrange)
 
             self.cursor_callback(x=event.xdata, y=event.ydata,
                                  message=msg, marker_data=marker_data)
 
     def report_motion(self, event=None):
-        if event.inaxes is None:
+        if event.inaxes is None or self.skip_motion(event):
             return
         x, y  = event.xdata, event.ydata
         if len(self.fig.get_axes()) > 1:
@@ -1124,15 +1377,19 @@ class PlotPanel(BasePanel):
                 x, y = self.axes.transData.inverted().transform((event.x, event.y))
             except:
                 pass
-        if x is not None and y is not None:
-            if self.use_dates:
-                ax  = self.canvas.figure.get_axes()[0]
-                xlims = ax.get_xlim()
-                xrange = abs(xlims[1] - xlims[0])
-                x = format_date(x, xrange, tz=self.dates_tzinfo)
-            else:
-                x = f"{x:g}"
-            msg = f"X,Y= {x}, {y:g}"
+        if x is None or y is None:
+            return
+        if self.snap_cursor:
+            near = self.get_nearest_point(x, y)
+            if near is not None:
+                x, y = near[2], near[3]
+        if callable(self.motion_callback):
+            self.motion_callback(wid=self.GetId(), x=x, y=y)
+        if self.use_dates:
+            xval = self.format_xdate(x)
+        else:
+            xval = f"{x:g}"
+        msg = f"X,Y= {xval}, {y:g}"
 
         nsbar = getattr(self, 'nstatusbar', 1)
-        self.write_message(msg, panel=max(0, nsbar-1))
+        self.write_motion_message(msg, panel=max(0, nsbar-1))
@@ -0,0 +1,109 @@
+#!/usr/bin/python
+"""
+fixed-size buffer of x, y data for streaming ("strip chart") plots.
+"""
+import numpy as np
+
+from .config import data_stats
+
+class RingBuffer:
+    """fixed-size buffer holding the most recent maxlen x, y points
+
+    Data are stored twice in preallocated arrays of length 2*maxlen,
+    so that the current data is always available as a contiguous,
+    time-ordered view without copying, and appending does not allocate
+    new arrays for the buffer.  The data range (as from data_stats()) is
+    kept up to date incrementally, and only recomputed when a point that
+    set the current range is dropped from the buffer.
+    """
+    def __init__(self, maxlen=10000, xdata=None, ydata=None):
+        self.maxlen = max(1, int(maxlen))
+        self._x = np.zeros(2*self.maxlen, dtype=np.float64)
+        self._y = np.zeros(2*self.maxlen, dtype=np.float64)
+        self.start = 0
+        self.count = 0
+        self._stats = None
+        self._stale = False
+        if xdata is not None and ydata is not None:
+            self.append(xdata, ydata)
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def xdata(self):
+        "x data, oldest first (a view into the buffer)"
+        return self._x[self.start:self.start+self.count]
+
+    @property
+    def ydata(self):
+        "y data, oldest first (a view into the buffer)"
+        return self._y[self.start:self.start+self.count]
+
+    def clear(self):
+        "remove all data"
+        self.start = self.count = 0
+        self._stats = None
+        self._stale = False
+
+    def append(self, xnew, ynew):
+        "append one or more x, y points, dropping the oldest points as needed"
+        xnew = np.atleast_1d(np.asarray(xnew, dtype=np.float64))
+        ynew = np.atleast_1d(np.asarray(ynew, dtype=np.float64))
+        if len(xnew) != len(ynew):
+            raise ValueError("RingBuffer.append() needs x and y of equal length")
+        npts = len(xnew)
+        if npts == 0:
+            return
+        maxlen = self.maxlen
+        if npts >= maxlen:
+            xnew, ynew = xnew[-maxlen:], ynew[-maxlen:]
+            self._x[:maxlen] = self._x[maxlen:] = xnew
+            self._y[:maxlen] = self._y[maxlen:] = ynew
+            self.start, self.count = 0, maxlen
+            self._stats = data_stats(xnew, ynew)
+            self._stale = False
+            return
+
+        ndrop = max(0, self.count + npts - maxlen)
+        if ndrop > 0 and self._stats is not None and not self._stale:
+            self._stale = self._drops_extreme(self.xdata[:ndrop],
+                                              self.ydata[:ndrop])
+
+        index = (self.start + self.count + np.arange(npts)) % maxlen
+        self._x[index] = self._x[index+maxlen] = xnew
+        self._y[index] = self._y[index+maxlen] = ynew
+        self.start = (self.start + ndrop) % maxlen
+        self.count = self.count + npts - ndrop
+
+        if not self._stale:
+            self._stats = _combine_stats(self._stats, data_stats(xnew, ynew))
+
+    def stats(self):
+        "data range for current data, as from data_stats()"
+        if self._stale:
+            self._stats = data_stats(self.xdata, self.ydata)
+            self._stale = False
+        return self._stats
+
+    def _drops_extreme(self, xold, yold):
+        "whether any of the dropped points sets the current data range"
+        xmin, xmax, ymin, ymax, xpos, ypos = self._stats
+        with np.errstate(invalid='ignore'):
+            return bool(np.any(xold <= xmin) or np.any(xold >= xmax) or
+                        np.any(yold <= ymin) or np.any(yold >= ymax) or
+                        (xpos is not None and np.any(xold == xpos)) or
+                        (ypos is not None and np.any(yold == ypos)))
+
+
+def _combine_stats(stats1, stats2):
+    "combine two data ranges from data_stats()"
+    if stats1 is None:
+        return stats2
+    if stats2 is None:
+        return stats1
+    out = [min(stats1[0], stats2[0]), max(stats1[1], stats2[1]),
+           min(stats1[2], stats2[2]), max(stats1[3], stats2[3])]
+    for a, b in zip(stats1[4:], stats2[4:]):
+        out.append(b if a is None else (a if b is None else min(a, b)))
+    return tuple(out)
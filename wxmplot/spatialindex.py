@@ -0,0 +1,166 @@
+#!/usr/bin/python
+"""
+spatial indices of x, y data for fast nearest-point and box lookups,
+as for cursor readout, snapping to data, and lasso selection.
+
+SortedIndex is used for data with monotonic x (the usual case for line
+traces), and uses bisection on x.  GridIndex is used for scatter data or
+other data with non-monotonic x, and bins points into a uniform grid.
+"""
+import numpy as np
+
+def is_monotonic(xdata):
+    "whether x data is monotonically increasing or decreasing"
+    xdata = np.asarray(xdata)
+    if len(xdata) < 2:
+        return True
+    with np.errstate(invalid='ignore'):
+        dx = np.diff(xdata)
+        return bool(np.all(dx >= 0) or np.all(dx <= 0))
+
+def make_index(xdata, ydata):
+    """make spatial index for x, y data: a SortedIndex for monotonic x,
+    and a GridIndex otherwise"""
+    if is_monotonic(xdata):
+        return SortedIndex(xdata, ydata)
+    return GridIndex(xdata, ydata)
+
+class SortedIndex:
+    """index of x, y data with monotonic x, using bisection on x
+
+    nearest() finds the point with the nearest x value.
+    """
+    def __init__(self, xdata, ydata):
+        self.xdata = np.asarray(xdata)
+        self.ydata = np.asarray(ydata)
+        self.npts = min(len(self.xdata), len(self.ydata))
+        self.reverse = self.npts > 1 and self.xdata[0] > self.xdata[self.npts-1]
+        self._x = self.xdata[:self.npts]
+        if self.reverse:
+            self._x = self._x[::-1]
+
+    def _original(self, index):
+        "convert index into sorted x to index into xdata"
+        if self.reverse:
+            return self.npts - 1 - index
+        return index
+
+    def nearest(self, x, y=None, xscale=1.0, yscale=1.0):
+        """index of point with x nearest to x, or None if there is no data
+        (y, xscale, and yscale are ignored)"""
+        if self.npts < 1:
+            return None
+        i = int(np.searchsorted(self._x, x))
+        if i >= self.npts:
+            i = self.npts - 1
+        elif i > 0 and abs(x - self._x[i-1]) <= abs(self._x[i] - x):
+            i = i - 1
+        return int(self._original(i))
+
+    def count_x(self, xmin, xmax):
+        "number of points with xmin <= x <= xmax"
+        return int(np.searchsorted(self._x, xmax, side='right') -
+                   np.searchsorted(self._x, xmin, side='left'))
+
+    def query_box(self, xmin, xmax, ymin, ymax):
+        "indices of points with xmin <= x <= xmax and ymin <= y <= ymax"
+        i0 = np.searchsorted(self._x, xmin, side='left')
+        i1 = np.searchsorted(self._x, xmax, side='right')
+        index = self._original(np.arange(i0, i1))
+        yd = self.ydata[index]
+        with np.errstate(invalid='ignore'):
+            return np.sort(index[(yd >= ymin) & (yd <= ymax)])
+
+
+class GridIndex:
+    """index of x, y data in any order, binning points into a uniform grid
+    of cells with about `per_cell` points per cell on average.
+
+    nearest() finds the point nearest in x/xscale, y/yscale, searching
+    outward from the cell holding the requested point.  Points with
+    non-finite x or y are not indexed.
+    """
+    def __init__(self, xdata, ydata, per_cell=4):
+        self.xdata = np.asarray(xdata, dtype=np.float64)
+        self.ydata = np.asarray(ydata, dtype=np.float64)
+        npts = min(len(self.xdata), len(self.ydata))
+        xd, yd = self.xdata[:npts], self.ydata[:npts]
+        valid = np.flatnonzero(np.isfinite(xd) & np.isfinite(yd))
+        self.npts = len(valid)
+        ncell = max(1, int(np.sqrt(max(1, self.npts)/per_cell)))
+        self.nx = self.ny = ncell
+        if self.npts > 0:
+            xd, yd = xd[valid], yd[valid]
+            self.xmin, self.xmax = xd.min(), xd.max()
+            self.ymin, self.ymax = yd.min(), yd.max()
+        else:
+            self.xmin = self.xmax = self.ymin = self.ymax = 0.0
+        self.dx = max((self.xmax - self.xmin)/self.nx, 1.e-300)
+        self.dy = max((self.ymax - self.ymin)/self.ny, 1.e-300)
+
+        cells = self._cell(self._col(xd), self._row(yd))
+        order = np.argsort(cells, kind='stable')
+        self.index = valid[order]
+        self.starts = np.searchsorted(cells[order],
+                                      np.arange(self.nx*self.ny + 1))
+
+    def _col(self, x):
+        col = np.clip((np.asarray(x) - self.xmin)/self.dx, 0, self.nx-1)
+        return col.astype(int)
+
+    def _row(self, y):
+        row = np.clip((np.asarray(y) - self.ymin)/self.dy, 0, self.ny-1)
+        return row.astype(int)
+
+    def _cell(self, col, row):
+        return row*self.nx + col
+
+    def _span(self, row, col0, col1):
+        "indices of points in cells col0 through col1 of a row"
+        col0, col1 = max(0, col0), min(self.nx-1, col1)
+        if row < 0 or row >= self.ny or col0 > col1:
+            return self.index[:0]
+        return self.index[self.starts[self._cell(col0, row)]:
+                          self.starts[self._cell(col1, row)+1]]
+
+    def nearest(self, x, y, xscale=1.0, yscale=1.0):
+        """index of point nearest to x, y, with distances in x and y
+        divided by xscale and yscale, or None if there is no data"""
+        if self.npts < 1:
+            return None
+        xscale = abs(xscale) if xscale else 1.0
+        yscale = abs(yscale) if yscale else 1.0
+        col, row = int(self._col(x)), int(self._row(y))
+        cellsize = min(self.dx/xscale, self.dy/yscale)
+        best, best_dist = None, np.inf
+        for ring in range(max(self.nx, self.ny)):
+            if ring == 0:
+                cand = [self._span(row, col, col)]
+            else:
+                cand = [self._span(row-ring, col-ring, col+ring),
+                        self._span(row+ring, col-ring, col+ring)]
+                for r in range(row-ring+1, row+ring):
+                    cand.append(self._span(r, col-ring, col-ring))
+                    cand.append(self._span(r, col+ring, col+ring))
+            cand = np.concatenate(cand)
+            if len(cand) > 0:
+                dist = (((self.xdata[cand] - x)/xscale)**2 +
+                        ((self.ydata[cand] - y)/yscale)**2)
+                i = np.argmin(dist)
+                if dist[i] < best_dist:
+                    best, best_dist = int(cand[i]), dist[i]
+            if best is not None and np.sqrt(best_dist) <= ring*cellsize:
+                break
+        return best
+
+    def query_box(self, xmin, xmax, ymin, ymax):
+        "indices of points with xmin <= x <= xmax and ymin <= y <= ymax"
+        if self.npts < 1 or xmin > self.xmax or xmax < self.xmin:
+            return self.index[:0]
+        col0, col1 = int(self._col(xmin)), int(self._col(xmax))
+        row0, row1 = int(self._row(ymin)), int(self._row(ymax))
+        index = np.concatenate([self._span(row, col0, col1)
+                                for row in range(row0, row1+1)])
+        xd, yd = self.xdata[index], self.ydata[index]
+        keep = (xd >= xmin) & (xd <= xmax) & (yd >= ymin) & (yd <= ymax)
+        return np.sort(index[keep])
@@ -361,11 +361,11 @@ class StackedPlotFrame(BaseFrame):
         bconf.set_margins(left=left, top=t, right=right, bottom=b)
         bconf.canvas.draw()
 
-    def set_viewlimits(self, panel='top'):
+    def set_viewlimits(self, panel='top', dirty_only=False):
         """update xy limits of a plot, as used with .update_line() """
         this_panel = self.get_panel(panel)
 
-        xmin, xmax, ymin, ymax = this_panel.conf.set_viewlimits()[0]
+        xmin, xmax, ymin, ymax = this_panel.conf.set_viewlimits(dirty_only=dirty_only)[0]
         # print("Set ViewLimits ", xmin, xmax, ymin, ymax)
         # make top/bottom panel follow xlimits
         if this_panel == self.panel:
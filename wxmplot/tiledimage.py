@@ -0,0 +1,87 @@
+#!/usr/bin/python
+"""
+out-of-core image data, as from np.memmap arrays or other array-like
+objects that support shape and slicing (h5py or zarr datasets, for
+example), read in tiles that are kept in an ArrayCache, so that showing
+part of an image only reads that part, and repeated views are not read
+again.
+"""
+import numpy as np
+from .arraycache import ArrayCache
+
+def is_out_of_core(data):
+    """whether image data is an np.memmap or an array-like object other
+    than an ndarray, and so should be read in tiles"""
+    if isinstance(data, np.memmap):
+        return True
+    return (not isinstance(data, np.ndarray) and hasattr(data, 'shape')
+            and hasattr(data, '__getitem__'))
+
+class TiledImage:
+    """image data (2D, or 3D with color as the last axis) read in tiles
+    of tilesize x tilesize pixels, which are kept in an LRU cache of no
+    more than maxbytes.
+
+    read() gets a window of the image, taking every step-th pixel, from
+    tiles of the image decimated by step.  sample() gets blocks spread
+    across the image, for estimating statistics without reading it all.
+    """
+    def __init__(self, data, tilesize=512, maxbytes=256*2**20):
+        self.data = data
+        self.shape = tuple(data.shape)
+        self.tilesize = tilesize
+        self.cache = ArrayCache(maxbytes=maxbytes)
+
+    def get_tile(self, row, col, step=1):
+        "tile of image decimated by step, read if not in cache"
+        key = (row, col, step)
+        tile = self.cache.get(key)
+        if tile is None:
+            n = self.tilesize*step
+            tile = np.asarray(self.data[row*n:(row+1)*n:step,
+                                        col*n:(col+1)*n:step])
+            self.cache.put(key, tile)
+        return tile
+
+    def read(self, window=None, step=1):
+        """read window (y0, y1, x0, x1) of image, or the full image for
+        None, taking every step-th pixel, as an ndarray"""
+        ny, nx = self.shape[:2]
+        if window is None:
+            window = (0, ny, 0, nx)
+        y0, y1, x0, x1 = window
+        # window of image decimated by step
+        y0, y1 = y0//step, min(-(-y1//step), -(-ny//step))
+        x0, x1 = x0//step, min(-(-x1//step), -(-nx//step))
+        if y1 <= y0 or x1 <= x0:
+            return np.asarray(self.data[0:0:step, 0:0:step])
+
+        tsize = self.tilesize
+        out = None
+        for row in range(y0//tsize, (y1-1)//tsize + 1):
+            for col in range(x0//tsize, (x1-1)//tsize + 1):
+                tile = self.get_tile(row, col, step=step)
+                if out is None:
+                    out = np.empty((y1-y0, x1-x0) + tile.shape[2:],
+                                   dtype=tile.dtype)
+                ty0, tx0 = row*tsize, col*tsize
+                a0, a1 = max(y0, ty0), min(y1, ty0 + tile.shape[0])
+                b0, b1 = max(x0, tx0), min(x1, tx0 + tile.shape[1])
+                out[a0-y0:a1-y0, b0-x0:b1-x0] = tile[a0-ty0:a1-ty0,
+                                                     b0-tx0:b1-tx0]
+        return out
+
+    def sample(self, maxpixels=2**20, nblocks=4):
+        """sample of image, as nblocks x nblocks square blocks spread
+        evenly across the image, with no more than maxpixels in total,
+        stacked vertically.  The full image is returned if it is small
+        enough."""
+        ny, nx = self.shape[:2]
+        if ny*nx <= maxpixels:
+            return self.read()
+        size = max(1, int(np.sqrt(maxpixels)/nblocks))
+        ysize, xsize = min(size, ny), min(size, nx)
+        ystarts = np.linspace(0, ny - ysize, nblocks).astype(int)
+        xstarts = np.linspace(0, nx - xsize, nblocks).astype(int)
+        return np.concatenate([np.asarray(self.data[y:y+ysize, x:x+xsize])
+                               for y in ystarts for x in xstarts], axis=0)
@@ -1,6 +1,14 @@
 #!/usr/bin/python
 #
+import os
+import time
+import pickle
+import threading
+from io import BytesIO
+from math import sqrt
+import numpy as np
 from matplotlib.path import Path as mplPath
+from matplotlib.ticker import Formatter, FuncFormatter
 
 import wx
 
@@ -33,7 +41,8 @@ class PrintoutWx(wx.Printout):
         return (1, 1, 1, 1)
 
     def OnPrintPage(self, page):
-        self.canvas.draw()
+        draw = getattr(self.canvas, 'draw_now', self.canvas.draw)
+        draw()
 
         ppw,pph = self.GetPPIPrinter()      # printer's pixels per in
         pgw,pgh = self.GetPageSizePixels()  # page size in pixels
@@ -61,7 +70,7 @@ class PrintoutWx(wx.Printout):
 
         # occasional crash here?
         try:
-            self.canvas.draw()
+            draw()
         except:
             return
 
@@ -89,7 +98,7 @@ class PrintoutWx(wx.Printout):
         # restore original figure  resolution
         self.canvas.figure.set_facecolor(bgcolor)
         self.canvas.figure.dpi = fig_dpi
-        self.canvas.draw()
+        draw()
         return True
 
 class Printer:
@@ -174,5 +183,289 @@ class Printer:
                           "Printing", wx.OK)
         printout.Destroy()
 
+class DrawScheduler:
+    """Coalesce requests to redraw a canvas, so that many requests
+    made in quick succession (as from a script making many calls that
+    each redraw the plot) give a single render.
+
+    request() schedules a render for when the wx event loop is idle, but
+    no sooner than min_interval seconds after the previous render, and
+    does nothing if a render is already scheduled.  draw_now() renders
+    immediately.  With enabled=False, every request renders immediately.
+
+    Counts of requested and performed draws and the time spent drawing
+    are kept, and returned by get_stats().
+    """
+    def __init__(self, draw, min_interval=1.0/60.0, enabled=True):
+        self._draw = draw
+        self.min_interval = min_interval
+        self.enabled = enabled
+        self.pending = False
+        self.last_draw = 0.0
+        self.reset_stats()
+
+    def reset_stats(self):
+        "reset draw counters and timers"
+        self.nrequested = 0
+        self.ndrawn = 0
+        self.draw_time = 0.0
+        self.max_draw_time = 0.0
+
+    def get_stats(self):
+        "dict of draw counters and timers (times in seconds)"
+        ndrawn = max(1, self.ndrawn)
+        return {'requested': self.nrequested, 'drawn': self.ndrawn,
+                'pending': self.pending, 'total_time': self.draw_time,
+                'mean_time': self.draw_time/ndrawn,
+                'max_time': self.max_draw_time}
+
+    def request(self, *args, **kws):
+        "request a redraw, to be done when idle"
+        self.nrequested += 1
+        if not self.enabled:
+            self.draw_now()
+            return
+        if self.pending:
+            return
+        self.pending = True
+        delay = self.min_interval - (time.perf_counter() - self.last_draw)
+        if delay > 0:
+            wx.CallLater(max(1, int(1000*delay)), self._on_timer)
+        else:
+            wx.CallAfter(self._on_timer)
+
+    def _on_timer(self):
+        if self.pending:
+            try:
+                self.draw_now()
+            except RuntimeError:  # canvas has been destroyed
+                self.pending = False
+
+    def draw_now(self):
+        "redraw immediately"
+        self.pending = False
+        t0 = time.perf_counter()
+        self._draw()
+        self.last_draw = time.perf_counter()
+        dtime = self.last_draw - t0
+        self.ndrawn += 1
+        self.draw_time += dtime
+        self.max_draw_time = max(self.max_draw_time, dtime)
+
+
+class TickLabels(Formatter):
+    """tick formatter with fixed labels for tick values, used in place
+    of a FuncFormatter for a copy of a figure"""
+    def __init__(self, labels):
+        self.labels = labels
+
+    def __call__(self, x, pos=None):
+        return self.labels.get(x, '%g' % x)
+
+class SnapshotPickler(pickle.Pickler):
+    """pickler for copying a figure, replacing FuncFormatters (which
+    usually call methods of a wx panel) with the labels they give for
+    the current ticks"""
+    def reducer_override(self, obj):
+        if isinstance(obj, FuncFormatter) and obj.axis is not None:
+            if obj is obj.axis.get_minor_formatter():
+                locs = obj.axis.get_minorticklocs()
+            else:
+                locs = obj.axis.get_majorticklocs()
+            return TickLabels, (dict(zip(locs, obj.format_ticks(locs))),)
+        return NotImplemented
+
+def snapshot_figure(fig):
+    """independent copy of a matplotlib figure, with the tick labels
+    currently shown, or None if the figure cannot be copied"""
+    buff = BytesIO()
+    try:
+        SnapshotPickler(buff, pickle.HIGHEST_PROTOCOL).dump(fig)
+        return pickle.loads(buff.getvalue())
+    except Exception:
+        return None
+
+def export_dpi(fig, dpi=600, max_pixels=None, min_dpi=72):
+    """dpi for saving a figure, reduced from dpi if needed so that the
+    image has no more than max_pixels pixels, but not below min_dpi"""
+    if max_pixels is None:
+        return dpi
+    width, height = fig.get_size_inches()
+    return max(min_dpi, min(dpi, int(sqrt(max_pixels/(width*height)))))
+
+class ExportCancelled(Exception):
+    "raised to stop a FigureExport"
+
+class FigureExport:
+    """Save a figure to a file on a worker thread.
+
+    The figure is copied when the FigureExport is created, so that the
+    plot can be used and redrawn while the copy is rendered and written.
+    A figure that cannot be copied is saved on the calling thread.
+
+    progress_callback(fraction, message) is called as the figure is
+    rendered and written, and done_callback(path, status) when finished,
+    with status of 'saved', 'cancelled', or an error message.  Both
+    are called from the worker thread.  cancel() stops the export at
+    the next artist drawn or block written, without leaving a file.
+
+    With max_pixels, dpi is reduced as needed to keep the number of
+    pixels in the image below max_pixels (see export_dpi()).
+    """
+    def __init__(self, fig, path, dpi=600, transparent=False,
+                 max_pixels=None, progress_callback=None,
+                 done_callback=None, blocksize=2**20):
+        self.path = path
+        self.dpi = export_dpi(fig, dpi=dpi, max_pixels=max_pixels)
+        self.transparent = transparent
+        self.progress_callback = progress_callback
+        self.done_callback = done_callback
+        self.blocksize = blocksize
+        self.status = None
+        self.thread = None
+        self._last_report = None
+        self.cancelled = threading.Event()
+        self.figure = snapshot_figure(fig)
+        self.threaded = self.figure is not None
+        if self.threaded:
+            self.watch_artists()
+        else:
+            self.figure = fig
+
+    def watch_artists(self):
+        "report progress and check for cancel as each artist is drawn"
+        artists = [a for ax in self.figure.get_axes()
+                   for a in ax.get_children()]
+        nartists = max(1, len(artists))
+        ndrawn = [0]
+        for artist in artists:
+            def draw(renderer, _draw=artist.draw):
+                if self.cancelled.is_set():
+                    raise ExportCancelled
+                self.progress(0.8*ndrawn[0]/nartists, 'rendering')
+                ndrawn[0] += 1
+                return _draw(renderer)
+            artist.draw = draw
+
+    def start(self):
+        "start export, on a worker thread if the figure could be copied"
+        if self.threaded:
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+        else:
+            self.run()
+        return self
+
+    def cancel(self):
+        "cancel export"
+        self.cancelled.set()
+
+    def is_running(self):
+        "whether export is still running"
+        return self.thread is not None and self.thread.is_alive()
+
+    def join(self, timeout=None):
+        "wait for export to finish"
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+    def progress(self, fraction, message):
+        "report progress, when the percentage done or message changes"
+        report = (round(100*fraction), message)
+        if report != self._last_report and callable(self.progress_callback):
+            self._last_report = report
+            self.progress_callback(fraction, message)
+
+    def run(self):
+        "render figure to memory, then write to a temporary file and rename"
+        tmpfile = None
+        try:
+            fmt = os.path.splitext(self.path)[1][1:].lower() or 'png'
+            buff = BytesIO()
+            self.progress(0, 'rendering')
+            self.figure.savefig(buff, format=fmt, dpi=self.dpi,
+                                transparent=self.transparent)
+            data = buff.getbuffer()
+            tmpfile = self.path + '.part'
+            with open(tmpfile, 'wb') as fh:
+                for i in range(0, len(data), self.blocksize):
+                    if self.cancelled.is_set():
+                        raise ExportCancelled
+                    self.progress(0.8 + 0.2*i/len(data), 'writing')
+                    fh.write(data[i:i+self.blocksize])
+            os.replace(tmpfile, self.path)
+            tmpfile = None
+            self.progress(1.0, 'saved')
+            self.status = 'saved'
+        except ExportCancelled:
+            self.status = 'cancelled'
+        except Exception as exc:
+            self.status = 'error: %s' % exc
+        finally:
+            if tmpfile is not None and os.path.exists(tmpfile):
+                os.remove(tmpfile)
+        if callable(self.done_callback):
+            self.done_callback(self.path, self.status)
+
+
 def inside_poly(vertices,data):
     return mplPath(vertices).contains_points(data)
+
+def polygon_mask(vertices, shape):
+    """boolean mask of shape (ny, nx) that is True for pixels (ix, iy)
+    inside a polygon, found by filling scanlines between edge crossings,
+    so that time and memory scale with the area of the polygon"""
+    ny, nx = shape[0], shape[1]
+    mask = np.zeros((ny, nx), dtype=bool)
+    verts = np.asarray(vertices, dtype=np.float64)
+    if len(verts) < 3:
+        return mask
+    xa, ya = verts[:, 0], verts[:, 1]
+    xb, yb = np.roll(xa, -1), np.roll(ya, -1)
+    # rows iy with min(ya, yb) <= iy < max(ya, yb) cross each edge
+    row0 = np.clip(np.ceil(np.minimum(ya, yb)), 0, ny).astype(int)
+    nrows = np.clip(np.ceil(np.maximum(ya, yb)), 0, ny).astype(int) - row0
+    keep = nrows > 0
+    if not keep.any():
+        return mask
+    xa, ya, xb, yb = xa[keep], ya[keep], xb[keep], yb[keep]
+    row0, nrows = row0[keep], nrows[keep]
+
+    edge = np.repeat(np.arange(len(row0)), nrows)
+    rows = row0[edge] + np.arange(len(edge)) - np.repeat(np.cumsum(nrows) - nrows, nrows)
+    xcross = xa[edge] + (rows - ya[edge])*(xb[edge] - xa[edge])/(yb[edge] - ya[edge])
+    order = np.lexsort((xcross, rows))
+    rows = rows[order]
+    cols = np.clip(np.ceil(xcross[order]), 0, nx).astype(int)
+
+    # each row has pairs of crossings, with pixels c0 <= ix < c1 inside
+    rmin, rmax = rows[0], rows[-1]
+    cmin, cmax = cols.min(), cols.max()
+    spans = np.zeros((rmax-rmin+1, cmax-cmin+1), dtype=np.int32)
+    np.add.at(spans, (rows[0::2]-rmin, cols[0::2]-cmin), 1)
+    np.add.at(spans, (rows[1::2]-rmin, cols[1::2]-cmin), -1)
+    mask[rmin:rmax+1, cmin:cmax] = np.cumsum(spans, axis=1)[:, :cmax-cmin] > 0
+    return mask
+
+def downsample_image(data, mode='mean'):
+    """reduce image data (2D, or 3D with color as the last axis) by a
+    factor of 2 in each dimension, taking the mean or max of each 2x2
+    block.  Odd sizes are padded by repeating the last row or column."""
+    ny, nx = data.shape[:2]
+    if ny % 2 or nx % 2:
+        pad = [(0, ny % 2), (0, nx % 2)] + [(0, 0)]*(data.ndim - 2)
+        data = np.pad(data, pad, mode='edge')
+        ny, nx = data.shape[:2]
+    blocks = data.reshape((ny//2, 2, nx//2, 2) + data.shape[2:])
+    if mode == 'max':
+        return blocks.max(axis=(1, 3))
+    dtype = np.result_type(data.dtype, np.float32)
+    return blocks.mean(axis=(1, 3), dtype=np.float64).astype(dtype, copy=False)
+
+def image_pyramid(data, mode='mean', minsize=256):
+    """list of image data downsampled by factors of 1, 2, 4, ..., with
+    mode 'mean' or 'max', until the smaller side is less than minsize"""
+    levels = [data]
+    while min(levels[-1].shape[:2]) >= 2*minsize:
+        levels.append(downsample_image(levels[-1], mode=mode))
+    return levels